@@ -0,0 +1,113 @@
+import os
+import re
+import sys
+from PyQt5.QtCore import QFileSystemWatcher, QObject, QTimer, QUrl, pyqtSignal
+from PyQt5.QtGui import QIcon
+
+
+def asset_root():
+    # a frozen build keeps its data files in the bundle directory, where
+    # app.spec collects them, older builds had them next to the executable
+    if getattr(sys, 'frozen', False):
+        for root in (getattr(sys, '_MEIPASS', None),
+                     os.path.dirname(sys.executable)):
+            if root and os.path.exists(os.path.join(root, 'head.html')):
+                return root
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+ROOT = asset_root()
+
+# the style sheet link in head.html, replaced by the style sheet itself
+STYLESHEET_LINK = re.compile(r'<link[^>]*href="css_style\.css"[^>]*>')
+
+# time to wait for an editor that saves by deleting and recreating a file
+REWATCH_MS = 200
+
+
+class AssetRegistry(QObject):
+
+    # relative path of an asset that changed on disk, such as
+    # "AppStyling.css" or "icons/add_icon.png"
+    changed = pyqtSignal(str)
+
+    # files read once for the whole process and shared by every widget,
+    # read again after they change on disk
+    def __init__(self, root=ROOT, parent=None):
+        super(AssetRegistry, self).__init__(parent)
+
+        self.root = root
+        self.texts = {}
+        self.icons = {}
+        self.head = None
+
+        # rendered pages load mathjax/ relative to this
+        self.base_url = QUrl.fromLocalFile(root + '/')
+
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self.file_changed)
+
+    def path(self, name):
+        return os.path.join(self.root, name)
+
+    def watch(self, name):
+        path = self.path(name)
+        if os.path.exists(path) and path not in self.watcher.files():
+            self.watcher.addPath(path)
+
+    def text(self, name):
+        text = self.texts.get(name)
+        if text is None:
+            with open(self.path(name), 'r', encoding='utf-8') as file:
+                text = file.read()
+            self.texts[name] = text
+            self.watch(name)
+        return text
+
+    def icon(self, file_name):
+        name = os.path.join('icons', file_name)
+        icon = self.icons.get(name)
+        if icon is None:
+            icon = self.icons[name] = QIcon(self.path(name))
+            self.watch(name)
+        return icon
+
+    def page_head(self):
+        # head.html with css_style.css inlined, so a rendered page does not
+        # read the style sheet from disk every time it loads
+        if self.head is None:
+            style = f"<style>\n{self.text('css_style.css')}</style>"
+            self.head = STYLESHEET_LINK.sub(
+                lambda match: style, self.text('head.html'))
+        return self.head
+
+    def file_changed(self, path):
+        name = os.path.relpath(path, self.root)
+        self.texts.pop(name, None)
+        self.icons.pop(name, None)
+        if name in ('head.html', 'css_style.css'):
+            self.head = None
+
+        # saving by replacing the file drops it from the watcher
+        if os.path.exists(path):
+            self.watch(name)
+        else:
+            QTimer.singleShot(REWATCH_MS, lambda: self.rewatch(name))
+            return
+        self.changed.emit(name)
+
+    def rewatch(self, name):
+        if os.path.exists(self.path(name)):
+            self.watch(name)
+            self.changed.emit(name)
+
+
+_registry = None
+
+
+def assets():
+    # the registry of the running process, created on first use
+    global _registry
+    if _registry is None:
+        _registry = AssetRegistry()
+    return _registry
@@ -0,0 +1,241 @@
+import argparse
+import hashlib
+import html
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from MarkdownExport import export_markdown, export_paths
+from MarkdownRenderer import (
+    PLUGINS, config_key, default_cache_directory, open_disk_cache,
+    render_markdown)
+from Notebook import Notebook
+from NotebookStorage import JOURNAL_EXTENSION, atomic_write
+
+# renders notebooks to static pages without a window, for example in CI
+#
+#   python BatchRenderer.py notebooks/ -o site/ --jobs 8
+#
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+NOTEBOOK_EXTENSIONS = ('.json', JOURNAL_EXTENSION)
+
+# the same page head and style sheet the rendered cells use
+HEAD_PATH = os.path.join(ROOT, 'head.html')
+CSS_PATH = os.path.join(ROOT, 'css_style.css')
+
+# remembers the content hash each output was rendered from
+MANIFEST_NAME = '.render-manifest.json'
+
+# bump whenever the page layout below changes
+PAGE_VERSION = 2
+
+PAGE_STYLE = '''<style>
+    .block { display: flex; gap: 20px; border-bottom: 1px solid #e2e6e9; }
+    .block.highlighted { background-color: #fff8c5; }
+    .cues { flex: 1; }
+    .notes { flex: 3; }
+</style>
+'''
+
+
+def read_text(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        return file.read()
+
+
+def config_hash(formats):
+    # anything that changes the output of every notebook at once, the
+    # renderer key covers its version, the mistune version and the plugins
+    config = hashlib.sha1()
+    for part in (str(PAGE_VERSION), config_key(PLUGINS), repr(sorted(formats)),
+                 read_text(HEAD_PATH), read_text(CSS_PATH)):
+        config.update(part.encode('utf-8'))
+    return config.hexdigest()
+
+
+def file_hash(path, config):
+    content = hashlib.sha1(config.encode('utf-8'))
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 16), b''):
+            content.update(chunk)
+    return content.hexdigest()
+
+
+def collect_notebooks(paths, output=None):
+    # (source path, output name without extension), a directory keeps its
+    # layout below the output directory, which is never read back in
+    output = os.path.abspath(output) if output is not None else None
+    notebooks = []
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, directories, file_names in os.walk(path):
+                directories[:] = [
+                    name for name in directories if os.path.abspath(
+                        os.path.join(directory, name)) != output]
+                for file_name in sorted(file_names):
+                    name, extension = os.path.splitext(file_name)
+                    if (extension in NOTEBOOK_EXTENSIONS and
+                            file_name != MANIFEST_NAME):
+                        source = os.path.join(directory, file_name)
+                        notebooks.append((source, os.path.join(
+                            os.path.relpath(directory, path), name)))
+        else:
+            name, _ = os.path.splitext(os.path.basename(path))
+            notebooks.append((path, name))
+    return notebooks
+
+
+def render_block(block):
+    highlighted = ' highlighted' if block.highlighted else ''
+    return (f'<section class="block{highlighted}">\n'
+            f'<div class="cues">\n{render_markdown(block.cues)}</div>\n'
+            f'<div class="notes">\n<h1>{html.escape(block.title)}</h1>\n'
+            f'{render_markdown(block.notes)}</div>\n'
+            f'</section>\n')
+
+
+def page_head(head_html, title):
+    # head.html with the charset first and the title and page style added
+    # at its end
+    if '</head>' not in head_html:
+        head_html = f'<head>\n{head_html}\n</head>'
+    head_html = head_html.replace(
+        '<head>', '<head>\n    <meta charset="utf-8">', 1)
+    title = f'<title>{html.escape(title)}</title>\n'
+    return head_html.replace('</head>', title + PAGE_STYLE + '</head>', 1)
+
+
+def render_page(notebook, head_html, title):
+    parts = ['<!DOCTYPE html>\n<html>\n', page_head(head_html, title),
+             '\n<body>\n']
+    parts.extend(render_block(block) for block in notebook)
+    parts.append('</body>\n</html>\n')
+    return ''.join(parts)
+
+
+def render_notebook(job):
+    # runs in a worker process, returns (source, blocks, bytes written)
+    source, base_path, formats = job
+    notebook = Notebook.load(source)
+    os.makedirs(os.path.dirname(base_path), exist_ok=True)
+
+    written = 0
+    if 'html' in formats:
+        page = render_page(notebook, read_text(HEAD_PATH),
+                           os.path.basename(base_path))
+        atomic_write(base_path + '.html', page)
+        written += len(page.encode('utf-8'))
+    if 'md' in formats:
+        for path in export_markdown(notebook, base_path):
+            written += os.path.getsize(path)
+    return source, len(notebook), written
+
+
+def init_worker(cache_directory):
+    if cache_directory is not None:
+        open_disk_cache(cache_directory)
+
+
+def load_manifest(path):
+    try:
+        with open(path, 'r') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def render_all(paths, output, formats=('html',), jobs=None, force=False,
+               cache_directory=None, report=print):
+    os.makedirs(output, exist_ok=True)
+    if 'html' in formats:
+        # head.html links the style sheet relative to the page
+        shutil.copyfile(CSS_PATH, os.path.join(output, 'css_style.css'))
+
+    manifest_path = os.path.join(output, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+    config = config_hash(formats)
+
+    todo = []
+    hashes = {}
+    skipped = 0
+    for source, name in collect_notebooks(paths, output):
+        key = os.path.abspath(source)
+        hashes[key] = file_hash(source, config)
+        base_path = os.path.join(output, name)
+        outputs = []
+        if 'html' in formats:
+            outputs.append(base_path + '.html')
+        if 'md' in formats:
+            outputs.extend(export_paths(base_path))
+        if (not force and manifest.get(key) == hashes[key] and
+                all(os.path.exists(path) for path in outputs)):
+            skipped += 1
+            continue
+        todo.append((source, base_path, tuple(formats)))
+
+    start = time.perf_counter()
+    blocks = 0
+    written = 0
+    failed = 0
+    try:
+        # every worker shares the render cache of the app sessions
+        with ProcessPoolExecutor(
+                max_workers=jobs, initializer=init_worker,
+                initargs=(cache_directory,)) as executor:
+            futures = {executor.submit(render_notebook, job): job[0]
+                       for job in todo}
+            for future, source in futures.items():
+                try:
+                    _, block_count, byte_count = future.result()
+                except Exception as error:
+                    report(f"Error rendering {source}: {error}")
+                    failed += 1
+                    continue
+                manifest[os.path.abspath(source)] = \
+                    hashes[os.path.abspath(source)]
+                blocks += block_count
+                written += byte_count
+    finally:
+        atomic_write(manifest_path, json.dumps(manifest, indent=2))
+
+    elapsed = time.perf_counter() - start
+    rendered = len(todo) - failed
+    report(f"rendered {rendered} notebooks ({blocks} blocks, "
+           f"{written / 1e6:.1f} MB), skipped {skipped} unchanged, "
+           f"{failed} failed in {elapsed:.2f} s")
+    if elapsed > 0 and rendered:
+        report(f"{rendered / elapsed:.1f} notebooks/s, "
+               f"{blocks / elapsed:.0f} blocks/s, "
+               f"{written / 1e6 / elapsed:.1f} MB/s")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Render Cornell notebooks to static HTML or Markdown.")
+    parser.add_argument('paths', nargs='+',
+                        help="notebook files or directories of notebooks")
+    parser.add_argument('-o', '--output', required=True)
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="worker processes, every core by default")
+    parser.add_argument('-f', '--format', choices=('html', 'md', 'both'),
+                        default='html')
+    parser.add_argument('--force', action='store_true',
+                        help="render unchanged notebooks again")
+    parser.add_argument('--cache', default=default_cache_directory(),
+                        help="render cache directory shared with the app")
+    parser.add_argument('--no-cache', dest='cache', action='store_const',
+                        const=None, help="do not use the render cache")
+    args = parser.parse_args()
+
+    formats = ('html', 'md') if args.format == 'both' else (args.format,)
+    failed = render_all(args.paths, args.output, formats, args.jobs,
+                        args.force, args.cache)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,38 @@
 from PyQt5.QtWidgets import QApplication, QTextEdit, QMainWindow, QTextBrowser, QWidget, QVBoxLayout
 from PyQt5.QtGui import QTextCursor, QColor, QTextBlockFormat, QFont, QTextCharFormat, QSyntaxHighlighter
-from PyQt5.QtCore import Qt, QRegExp, QRegularExpression
-import mistune
-from pygments import highlight
-from pygments.lexers import get_lexer_by_name
-from pygments.formatters import html
-from mistune import HTMLRenderer, escape
+from PyQt5.QtCore import Qt, QRegExp, QRegularExpression, QTimer, pyqtSignal
+import math
 import sys
+import time
+from collections import deque
 
 class MarkdownHighlighter(QSyntaxHighlighter):
+
+    # block states carried from one line to the next
+    NORMAL = -1
+    IN_CODE_BLOCK = 1
+    IN_MATH_BLOCK = 2
+
+    # capture group of an opening $$ that is not closed on its line
+    MATH_BLOCK_OPEN = 4
+
+    # the patterns are compiled once and a line is tokenized in one pass,
+    # the leftmost match wins and earlier alternatives take precedence
+    heading = QRegularExpression(r'^#+\s')
+    fence = QRegularExpression(r'^\s*```')
+    mathBlockEnd = QRegularExpression(r'\$\$')
+    tokens = QRegularExpression(
+        r'(```.*?```)'
+        r'|(`[^`]+`)'
+        r'|(\$\$.*?\$\$)'
+        r'|(\$\$.*$)'
+        r'|(\$.*?\$)'
+        r'|(\*\*\*.*?\*\*\*)'
+        r'|(\*\*.*?\*\*)'
+        r'|(\*.*?\*)'
+        r'|(\=\=.*?\=\=)'
+        r'|(\[[^\]]+\]\([^)]+\))')
+
     def __init__(self, parent=None):
         super(MarkdownHighlighter, self).__init__(parent)
 
@@ -45,32 +69,104 @@ class MarkdownHighlighter(QSyntaxHighlighter):
         linkFormat = QTextCharFormat()
         linkFormat.setForeground(QColor(131, 178, 196))
 
-        self.highlightingRules = [
-            (QRegularExpression(r'^#+\s.*'), headingFormat),  # Headings
-            (QRegularExpression(r'\=\=(.*?)\=\='),
-             highlightFormat),  # highlight text
-            (QRegularExpression(r'\*(.*?)\*'), italicFormat),  # Italic text
-            (QRegularExpression(r'\*\*(.*?)\*\*'), boldFormat),  # Bold text
-            (QRegularExpression(r'\*\*\*(.*?)\*\*\*'),
-             boldItalicFormat),  # Bold and italic text
-            (QRegularExpression(r'`([^`]+)`'), inlineCodeFormat),  # Code
-            (QRegularExpression(r'\$(.*?)\$'), inlineMathFormat),  # Inline equations
-            (QRegularExpression(r'\[([^\]]+)\]\(([^)]+)\)'),
-             linkFormat),  # Links
-            (QRegularExpression(r'```(.*?)```',
-             QRegularExpression.DotMatchesEverythingOption |
-             QRegularExpression.MultilineOption), codeBlockFormat)
-            # Add more highlighting rules for other Markdown elements.
+        self.headingFormat = headingFormat
+        self.codeBlockFormat = codeBlockFormat
+        self.mathBlockFormat = inlineMathFormat
+
+        # formats of the alternatives in MarkdownHighlighter.tokens, by
+        # capture group number
+        self.tokenFormats = [
+            None,
+            codeBlockFormat,  # code block within a single line
+            inlineCodeFormat,  # Code
+            inlineMathFormat,  # display equations within a single line
+            inlineMathFormat,  # opening of a display equation
+            inlineMathFormat,  # Inline equations
+            boldItalicFormat,  # Bold and italic text
+            boldFormat,  # Bold text
+            italicFormat,  # Italic text
+            highlightFormat,  # highlight text
+            linkFormat,  # Links
         ]
 
     def highlightBlock(self, text):
-        for pattern, char_format in self.highlightingRules:
-            expression = QRegularExpression(pattern)
-            match = expression.match(text)
-            while match.hasMatch():
-                self.setFormat(match.capturedStart(),
-                               match.capturedLength(), char_format)
-                match = expression.match(text, match.capturedEnd())
+        state = self.previousBlockState()
+        length = len(text.encode('utf-16-le')) // 2
+        start = 0
+
+        if state == self.IN_CODE_BLOCK:
+            self.setFormat(0, length, self.codeBlockFormat)
+            if self.fence.match(text).hasMatch():
+                self.setCurrentBlockState(self.NORMAL)
+            else:
+                self.setCurrentBlockState(self.IN_CODE_BLOCK)
+            return
+
+        if state == self.IN_MATH_BLOCK:
+            match = self.mathBlockEnd.match(text)
+            if not match.hasMatch():
+                self.setFormat(0, length, self.mathBlockFormat)
+                self.setCurrentBlockState(self.IN_MATH_BLOCK)
+                return
+            start = match.capturedEnd()
+            self.setFormat(0, start, self.mathBlockFormat)
+
+        state = self.NORMAL
+
+        if start == 0 and self.heading.match(text).hasMatch():
+            self.setFormat(0, length, self.headingFormat)
+
+        matches = self.tokens.globalMatch(text, start)
+        while matches.hasNext():
+            match = matches.next()
+            group = match.lastCapturedIndex()
+            self.setFormat(match.capturedStart(),
+                           match.capturedLength(), self.tokenFormats[group])
+            if group == self.MATH_BLOCK_OPEN:
+                state = self.IN_MATH_BLOCK
+
+        # a fence that is not closed on the same line opens a code block
+        if start == 0 and state == self.NORMAL:
+            if self.fence.match(text).hasMatch() and text.count('```') == 1:
+                self.setFormat(0, length, self.codeBlockFormat)
+                state = self.IN_CODE_BLOCK
+
+        self.setCurrentBlockState(state)
+
+
+class KeyLatencyRecorder:
+    def __init__(self, max_samples=1000, report_every=0, report=print):
+        # time from a key press until the event loop is idle again
+        self.samples = deque(maxlen=max_samples)
+        self.count = 0
+
+        self.report_every = report_every
+        self.report = report
+
+    def key_pressed(self):
+        start = time.perf_counter()
+        # zero timers only fire once the events queued by the key are done
+        QTimer.singleShot(
+            0, lambda: self.add_sample(time.perf_counter() - start))
+
+    def add_sample(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+
+        if self.report_every and self.count % self.report_every == 0:
+            self.report(self.summary())
+
+    def percentile(self, percent):
+        if not self.samples:
+            return 0.0
+        samples = sorted(self.samples)
+        index = min(int(len(samples) * percent / 100), len(samples) - 1)
+        return samples[index]
+
+    def summary(self):
+        return (f"key latency p50 {self.percentile(50) * 1000:.2f} ms, "
+                f"p99 {self.percentile(99) * 1000:.2f} ms "
+                f"over {len(self.samples)} keys")
 
 
 class MarkdownTextEdit(QTextEdit):
@@ -85,13 +181,36 @@ class MarkdownTextEdit(QTextEdit):
         "<": ">",
         "`": "`", }
 
+    # set to a KeyLatencyRecorder to time every key press in every editor
+    latency_recorder = None
+
+    # emitted when the laid out text needs a different height
+    heightChanged = pyqtSignal(int)
+
     def __init__(self, *args, **kwargs):
         super(MarkdownTextEdit, self).__init__(*args, **kwargs)
 
+        # headings and all other styling come from the highlighter
         self.highlighter = MarkdownHighlighter(self.document())
 
+        # height of the laid out text, wrapping included, kept up to date
+        # by the document layout instead of measuring the whole text
+        self.content_height = 0
+        layout = self.document().documentLayout()
+        layout.documentSizeChanged.connect(self.set_content_height)
+        self.set_content_height(layout.documentSize())
+
+    def set_content_height(self, size):
+        height = math.ceil(size.height()) + 2 * self.frameWidth()
+        if height != self.content_height:
+            self.content_height = height
+            self.heightChanged.emit(height)
+
     def keyPressEvent(self, event):
 
+        if self.latency_recorder is not None:
+            self.latency_recorder.key_pressed()
+
         symbol = event.text()
 
         cursor = self.textCursor()
@@ -112,24 +231,14 @@ class MarkdownTextEdit(QTextEdit):
                 self.setTextCursor(cursor)
 
             else:
-                cursor.insertText(symbol)
-                cursor.insertText(self.get_closing_bracket(symbol))
+                # a single insertion keeps it to one document change
+                cursor.insertText(symbol + self.get_closing_bracket(symbol))
                 cursor.movePosition(QTextCursor.PreviousCharacter)
                 self.setTextCursor(cursor)
 
         else:
             super(MarkdownTextEdit, self).keyPressEvent(event)
 
-        format = QTextCharFormat()
-        format.setFontWeight(QFont.Normal)
-
-        if cursor.block().text().startswith("# "):
-            format.setFontWeight(QFont.Bold)
-
-        cursor.select(QTextCursor.LineUnderCursor)
-        cursor.mergeCharFormat(format)
-
-
     @staticmethod
     def get_closing_bracket(opening_bracket):
         return MarkdownTextEdit.auto_pairing_symbols[opening_bracket]
@@ -0,0 +1,64 @@
+from NotebookStorage import atomic_open
+
+# written between two exported blocks when separators are turned on
+BLOCK_SEPARATOR = '\n\n---\n\n'
+
+# size of the write buffer of each exported file
+BUFFER_SIZE = 1 << 16
+
+
+class ExportOptions:
+    def __init__(self, separator='', titles_as_headings=False,
+                 highlighted_only=False):
+        # the defaults reproduce the plain concatenation of the blocks
+        self.separator = separator
+        self.titles_as_headings = titles_as_headings
+        self.highlighted_only = highlighted_only
+
+
+def export_paths(base_path):
+    return f"{base_path}_notes.md", f"{base_path}_cues.md"
+
+
+def heading(block):
+    # hierarchy 0 is a top level heading, markdown stops at six levels
+    level = min(block.hierarchy + 1, 6)
+    return f"{'#' * level} {block.title}\n\n"
+
+
+def export_markdown(blocks, base_path, options=None, progress=None,
+                    progress_every=256):
+    # streams notes and cues block by block into both files in one pass,
+    # blocks is a sequence of Block or Notebook rows that nobody edits
+    # while the export runs
+    options = options or ExportOptions()
+    notes_path, cues_path = export_paths(base_path)
+    total = len(blocks)
+
+    with atomic_open(notes_path, BUFFER_SIZE) as notes_file, \
+            atomic_open(cues_path, BUFFER_SIZE) as cues_file:
+        exported = 0
+        for row, block in enumerate(blocks):
+            if progress is not None and row % progress_every == 0:
+                progress(row, total)
+
+            if options.highlighted_only and not block.highlighted:
+                continue
+
+            if exported and options.separator:
+                notes_file.write(options.separator)
+                cues_file.write(options.separator)
+
+            if options.titles_as_headings and block.title:
+                title = heading(block)
+                notes_file.write(title)
+                cues_file.write(title)
+
+            notes_file.write(block.notes)
+            cues_file.write(block.cues)
+            exported += 1
+
+    if progress is not None:
+        progress(total, total)
+
+    return notes_path, cues_path
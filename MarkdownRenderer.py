@@ -0,0 +1,273 @@
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from NotebookStorage import atomic_write
+
+try:
+    import fcntl
+except ImportError:
+    # no locking on windows, a lost race only costs a stale index entry
+    fcntl = None
+
+# the plugin configuration used for every rendered cell
+PLUGINS = ('strikethrough', 'table', 'url', 'task_lists',
+           'math', 'ruby', 'spoiler')
+
+# bump whenever the html produced for the same markdown changes
+RENDER_VERSION = 1
+
+_markdown_instances = {}
+_config_keys = {}
+
+
+def get_markdown(plugins=PLUGINS):
+    # build each parser once and share it between every cell
+    plugins = tuple(plugins)
+    markdown = _markdown_instances.get(plugins)
+    if markdown is None:
+        # imported on the first render, not when the app starts
+        import mistune
+        markdown = mistune.create_markdown(
+            renderer=mistune.HTMLRenderer(), plugins=list(plugins))
+        _markdown_instances[plugins] = markdown
+    return markdown
+
+
+def config_key(plugins=PLUGINS):
+    # everything besides the markdown itself that shapes the html
+    plugins = tuple(plugins)
+    key = _config_keys.get(plugins)
+    if key is None:
+        import mistune
+        key = f"{RENDER_VERSION}:{mistune.__version__}:{','.join(plugins)}\0"
+        _config_keys[plugins] = key
+    return key
+
+
+def render_key(markdown_text, plugins=PLUGINS):
+    return hashlib.sha1(
+        (config_key(plugins) + markdown_text).encode('utf-8')).digest()
+
+
+class RenderCache:
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+        # live previews render on a worker thread
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            html = self.entries.get(key)
+            if html is not None:
+                self.entries.move_to_end(key)
+            return html
+
+    def put(self, key, html):
+        with self.lock:
+            self.entries[key] = html
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class DiskRenderCache:
+
+    # magic, slot count, bytes of html stored, entry count
+    HEADER = struct.Struct('<4sIQI')
+    # render key, bytes of html, last use in nanoseconds
+    SLOT = struct.Struct('<20sIQ')
+    MAGIC = b'CRC1'
+    EMPTY = bytes(20)
+
+    # html fragments stored by render key below objects/, indexed by an
+    # open addressing hash table in a memory mapped file, shared between
+    # app sessions and batch renderer processes
+    def __init__(self, directory, max_bytes=256 << 20, slots=1 << 16):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(directory, 'objects'), exist_ok=True)
+
+        # flock only keeps other processes out, not other threads
+        self.thread_lock = threading.Lock()
+
+        # binary on windows too, a text mode fd would translate newlines
+        flags = os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0)
+        fd = os.open(os.path.join(directory, 'index'), flags)
+        self.index_file = os.fdopen(fd, 'r+b')
+        with self.locked():
+            header = self.index_file.read(self.HEADER.size)
+            if (len(header) == self.HEADER.size and
+                    header[:4] == self.MAGIC):
+                slots = self.HEADER.unpack(header)[1]
+            else:
+                self.index_file.truncate(0)
+                self.index_file.truncate(
+                    self.HEADER.size + slots * self.SLOT.size)
+                self.index_file.seek(0)
+                self.index_file.write(
+                    self.HEADER.pack(self.MAGIC, slots, 0, 0))
+                self.index_file.flush()
+
+            self.slots = slots
+            self.index = mmap.mmap(
+                fd, self.HEADER.size + slots * self.SLOT.size)
+
+        # evicting keeps the table sparse enough for short probes
+        self.max_entries = slots * 7 // 10
+
+    @contextmanager
+    def locked(self):
+        with self.thread_lock:
+            if fcntl is None:
+                yield
+                return
+            fcntl.flock(self.index_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self.index_file.fileno(), fcntl.LOCK_UN)
+
+    def object_path(self, key):
+        name = key.hex()
+        return os.path.join(
+            self.directory, 'objects', name[:2], name[2:] + '.html')
+
+    def find(self, key):
+        # offset of the slot holding key, or of the empty slot ending
+        # its probe sequence
+        slot = int.from_bytes(key[:8], 'little') % self.slots
+        while True:
+            offset = self.HEADER.size + slot * self.SLOT.size
+            stored = self.index[offset:offset + 20]
+            if stored == key:
+                return offset, True
+            if stored == self.EMPTY:
+                return offset, False
+            slot = (slot + 1) % self.slots
+
+    def get(self, key):
+        offset, found = self.find(key)
+        if not found:
+            return None
+        try:
+            with open(self.object_path(key), 'r', encoding='utf-8') as file:
+                html = file.read()
+        except OSError:
+            # evicted by another process in the meantime
+            return None
+        struct.pack_into('<Q', self.index, offset + 24, time.time_ns())
+        return html
+
+    def put(self, key, html):
+        if self.find(key)[1]:
+            return
+
+        data = html.encode('utf-8')
+        path = self.object_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        atomic_write(path, html, fsync=False)
+
+        with self.locked():
+            offset, found = self.find(key)
+            if found:
+                return
+            self.SLOT.pack_into(
+                self.index, offset, key, len(data), time.time_ns())
+            _, slots, total, entries = self.HEADER.unpack_from(self.index, 0)
+            total += len(data)
+            entries += 1
+            self.HEADER.pack_into(
+                self.index, 0, self.MAGIC, slots, total, entries)
+
+            if total > self.max_bytes or entries > self.max_entries:
+                self.evict()
+
+    def entries(self):
+        for slot in range(self.slots):
+            offset = self.HEADER.size + slot * self.SLOT.size
+            key, size, used = self.SLOT.unpack_from(self.index, offset)
+            if key != self.EMPTY:
+                yield used, key, size
+
+    def evict(self):
+        # keep the most recently used fragments within 90 percent of the
+        # limits, then rebuild the table without the evicted ones
+        kept = []
+        total = 0
+        for used, key, size in sorted(self.entries(), reverse=True):
+            if (total + size <= self.max_bytes * 9 // 10 and
+                    len(kept) < self.max_entries * 9 // 10):
+                kept.append((used, key, size))
+                total += size
+            else:
+                try:
+                    os.remove(self.object_path(key))
+                except OSError:
+                    pass
+
+        self.index[self.HEADER.size:] = bytes(self.slots * self.SLOT.size)
+        for used, key, size in kept:
+            offset, _ = self.find(key)
+            self.SLOT.pack_into(self.index, offset, key, size, used)
+        self.HEADER.pack_into(
+            self.index, 0, self.MAGIC, self.slots, total, len(kept))
+
+    def close(self):
+        self.index.close()
+        self.index_file.close()
+
+
+def default_cache_directory():
+    base = (os.environ.get('LOCALAPPDATA') or
+            os.environ.get('XDG_CACHE_HOME') or
+            os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(base, 'cornell-markdown', 'render')
+
+
+render_cache = RenderCache()
+
+# the shared on-disk cache behind render_cache, off until opened
+disk_cache = None
+
+
+def open_disk_cache(directory=None, max_bytes=256 << 20):
+    global disk_cache
+    if disk_cache is not None:
+        disk_cache.close()
+    disk_cache = DiskRenderCache(
+        directory or default_cache_directory(), max_bytes)
+    return disk_cache
+
+
+def render_markdown(markdown_text, plugins=PLUGINS):
+    plugins = tuple(plugins)
+    key = render_key(markdown_text, plugins)
+
+    html = render_cache.get(key)
+    if html is not None:
+        return html
+
+    if disk_cache is not None:
+        html = disk_cache.get(key)
+    if html is None:
+        html = get_markdown(plugins)(markdown_text)
+        if disk_cache is not None:
+            try:
+                disk_cache.put(key, html)
+            except OSError as error:
+                # a full or read only disk only costs the next session
+                print(f"Error writing render cache: {error}")
+
+    render_cache.put(key, html)
+    return html
@@ -0,0 +1,174 @@
+import itertools
+from array import array
+from NotebookStorage import BlockSerializer, read_notebook
+
+
+class Block:
+
+    __slots__ = ('id', 'version', 'title', 'notes', 'cues',
+                 'hierarchy', 'highlighted')
+
+    # ids are stable for the lifetime of the block but not saved
+    _ids = itertools.count()
+
+    # assigning any of these bumps the version, so saves can tell which
+    # blocks changed since the last one
+    fields = ('title', 'notes', 'cues', 'hierarchy', 'highlighted')
+
+    def __init__(self, title='', notes='', cues='', hierarchy=0, highlighted=0):
+        self.version = 0
+        self.id = next(Block._ids)
+        self.title = title
+        self.notes = notes
+        self.cues = cues
+        self.hierarchy = hierarchy
+        self.highlighted = highlighted
+
+    def to_dict(self):
+        return {
+            'title': self.title,
+            'notes': self.notes,
+            'cues': self.cues,
+            'hierarchy': self.hierarchy,
+            'highlighted': self.highlighted
+        }
+
+    def __setattr__(self, name, value):
+        if name in self.fields:
+            super(Block, self).__setattr__('version', self.version + 1)
+        super(Block, self).__setattr__(name, value)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+class BlockView:
+
+    __slots__ = ('notebook', 'row')
+
+    # reads one row of a Notebook without copying it out
+    def __init__(self, notebook, row):
+        self.notebook = notebook
+        self.row = row
+
+    @property
+    def title(self):
+        return self.notebook.titles[self.row]
+
+    @property
+    def notes(self):
+        return self.notebook.notes[self.row]
+
+    @property
+    def cues(self):
+        return self.notebook.cues[self.row]
+
+    @property
+    def hierarchy(self):
+        return self.notebook.hierarchy[self.row]
+
+    @property
+    def highlighted(self):
+        return self.notebook.highlighted[self.row]
+
+    def to_dict(self):
+        return self.notebook.row_dict(self.row)
+
+
+class Notebook:
+
+    # parallel columns, one entry per block, for notebooks that are only
+    # searched, rendered or exported and never opened in the editor
+    def __init__(self):
+        self.titles = []
+        self.notes = []
+        self.cues = []
+        self.hierarchy = array('l')
+        self.highlighted = array('b')
+
+    @classmethod
+    def from_blocks_data(cls, blocks_data):
+        # an empty notebook is written as {}, any other JSON is not one
+        if not blocks_data:
+            blocks_data = []
+        if not isinstance(blocks_data, list):
+            raise ValueError("Not a list of blocks")
+
+        notebook = cls()
+        for data in blocks_data:
+            if not isinstance(data, dict):
+                raise ValueError(f"Not a block: {data!r:.40}")
+            try:
+                notebook.append(**data)
+            except TypeError as error:
+                raise ValueError(f"Not a block: {error}")
+        return notebook
+
+    @classmethod
+    def from_blocks(cls, blocks):
+        # a copy that stays put while the blocks keep being edited, the
+        # strings themselves are shared, not copied
+        notebook = cls()
+        for block in blocks:
+            notebook.append(block.title, block.notes, block.cues,
+                            block.hierarchy, block.highlighted)
+        return notebook
+
+    @classmethod
+    def load(cls, path):
+        return cls.from_blocks_data(read_notebook(path))
+
+    def append(self, title='', notes='', cues='', hierarchy=0, highlighted=0):
+        self.titles.append(title)
+        self.notes.append(notes)
+        self.cues.append(cues)
+        self.hierarchy.append(hierarchy)
+        self.highlighted.append(highlighted)
+
+    def __len__(self):
+        return len(self.titles)
+
+    def __getitem__(self, row):
+        if not -len(self) <= row < len(self):
+            raise IndexError(row)
+        return BlockView(self, row % len(self))
+
+    def __iter__(self):
+        return (BlockView(self, row) for row in range(len(self)))
+
+    def row_dict(self, row):
+        return {
+            'title': self.titles[row],
+            'notes': self.notes[row],
+            'cues': self.cues[row],
+            'hierarchy': self.hierarchy[row],
+            'highlighted': self.highlighted[row]
+        }
+
+    def to_blocks(self):
+        # materialize editable blocks, for opening in the editor
+        return [Block(*row) for row in zip(
+            self.titles, self.notes, self.cues,
+            self.hierarchy, self.highlighted)]
+
+    def to_blocks_data(self):
+        return [self.row_dict(row) for row in range(len(self))]
+
+    def to_json(self, indent=2):
+        # same text as json.dumps(self.to_blocks_data(), indent=indent),
+        # reusing one dict for every row
+        serializer = BlockSerializer(indent=indent)
+        data = {}
+        fragments = []
+        for row in zip(self.titles, self.notes, self.cues,
+                       self.hierarchy, self.highlighted):
+            data['title'], data['notes'], data['cues'], \
+                data['hierarchy'], data['highlighted'] = row
+            fragments.append(serializer.fragment(data))
+
+        if not fragments:
+            return '[]'
+        if indent is None:
+            return '[' + ', '.join(fragments) + ']'
+        return '[\n' + ',\n'.join(fragments) + '\n]'
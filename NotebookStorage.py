@@ -0,0 +1,303 @@
+import json
+import os
+import stat
+import sys
+import tempfile
+from contextlib import contextmanager
+
+JOURNAL_EXTENSION = '.journal'
+JOURNAL_FORMAT = 'cornell-journal'
+
+# read once, os.umask can only be read by setting it
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+@contextmanager
+def atomic_open(path, buffering=-1, fsync=True):
+    # write into a temporary file next to the target, then swap it in with
+    # a rename so a crash never leaves a half written file behind, caches
+    # that can be rebuilt skip the fsync
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(
+        dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', buffering=buffering, encoding='utf-8') as file:
+            # mkstemp creates the file as 0600, keep the mode of the file
+            # it replaces, or the one open() would give a new file
+            try:
+                mode = stat.S_IMODE(os.stat(path).st_mode)
+            except FileNotFoundError:
+                mode = 0o666 & ~UMASK
+            os.chmod(temp_path, mode)
+
+            yield file
+            if fsync:
+                file.flush()
+                os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def atomic_write(path, text, fsync=True):
+    with atomic_open(path, fsync=fsync) as file:
+        file.write(text)
+
+
+def write_notebook(path, blocks_data):
+    atomic_write(path, json.dumps(blocks_data, indent=2))
+
+
+class BlockSerializer:
+    def __init__(self, indent=None):
+        # same layout as json.dumps(blocks_data, indent=indent)
+        self.indent = indent
+
+        # block id to the version last handed to the worker, kept on the
+        # gui thread, and block id to its serialized text, kept on the worker
+        self.versions = {}
+        self.fragments = {}
+
+    def snapshot(self, blocks):
+        # only blocks whose version moved are copied out
+        entries = []
+        for block in blocks:
+            if self.versions.get(block.id) != block.version:
+                self.versions[block.id] = block.version
+                entries.append((block.id, block.to_dict()))
+            else:
+                entries.append((block.id, None))
+        return entries
+
+    def serialize(self, entries):
+        fragments = {}
+        for block_id, data in entries:
+            if data is None:
+                fragments[block_id] = self.fragments[block_id]
+            else:
+                fragments[block_id] = self.fragment(data)
+        # dropping the fragments of removed blocks
+        self.fragments = fragments
+
+        if not entries:
+            return '[]'
+        if self.indent is None:
+            return '[' + ', '.join(fragments[i] for i, _ in entries) + ']'
+        return ('[\n' + ',\n'.join(fragments[i] for i, _ in entries) + '\n]')
+
+    def fragment(self, data):
+        if self.indent is None:
+            return json.dumps(data)
+        # strings never hold a raw newline, so this only indents the layout
+        padding = ' ' * self.indent
+        return padding + json.dumps(data, indent=self.indent).replace(
+            '\n', '\n' + padding)
+
+    def invalidate(self):
+        # after a failed save everything is serialized again
+        self.versions = {}
+
+
+def open_store(path):
+    if path.endswith(JOURNAL_EXTENSION):
+        return JournalStore(path)
+    return JsonStore(path)
+
+
+def read_notebook(path):
+    return open_store(path).load()
+
+
+def apply_op(blocks_data, op):
+    # replays one block level edit on the plain list of block dicts, rows
+    # and move destinations follow the same conventions as BlocksModel
+    kind = op['op']
+    row = op['row']
+
+    if kind == 'set':
+        blocks_data[row][op['field']] = op['value']
+    elif kind == 'insert':
+        blocks_data.insert(row, dict(op['block']))
+    elif kind == 'remove':
+        blocks_data.pop(row)
+    elif kind == 'move':
+        count = op['count']
+        destination = op['destination']
+        moved = blocks_data[row:row + count]
+        del blocks_data[row:row + count]
+        if destination > row:
+            destination -= count
+        blocks_data[destination:destination] = moved
+    else:
+        raise ValueError(f"Unknown journal operation: {kind}")
+
+
+class JsonStore:
+
+    # rewrites the whole notebook as one JSON array on every save
+    journaled = False
+
+    def __init__(self, path):
+        self.path = path
+        self.serializer = BlockSerializer(indent=2)
+
+    def create(self):
+        with open(self.path, 'w') as file:
+            json.dump({}, file)
+
+    def load(self):
+        with open(self.path, 'r') as file:
+            return json.load(file)
+
+    def needs_snapshot(self):
+        return True
+
+    def snapshot(self, blocks):
+        return self.serializer.snapshot(blocks)
+
+    def save(self, entries, ops):
+        try:
+            atomic_write(self.path, self.serializer.serialize(entries))
+        except BaseException:
+            self.serializer.invalidate()
+            raise
+
+
+class JournalStore:
+
+    # the first line holds a snapshot of the blocks, every following line
+    # is one block level edit appended as it happens
+    journaled = True
+
+    def __init__(self, path, compact_bytes=1 << 20):
+        self.path = path
+        self.compact_bytes = compact_bytes
+
+        self.snapshot_bytes = 0
+        self.log_bytes = 0
+
+        # set when an append failed, it may have left a torn line or lost
+        # ops that later ones depend on, so nothing more is appended until
+        # a snapshot has been written
+        self.broken = False
+
+        self.serializer = BlockSerializer()
+
+    def create(self):
+        self.compact([])
+
+    def load(self):
+        with open(self.path, 'rb') as file:
+            lines = file.read().split(b'\n')
+
+        header = json.loads(lines[0])
+        if header.get('format') != JOURNAL_FORMAT:
+            raise ValueError(f"Not a notebook journal: {self.path}")
+
+        blocks_data = header['blocks']
+        self.snapshot_bytes = len(lines[0]) + 1
+        self.log_bytes = 0
+
+        offset = self.snapshot_bytes
+        for index, line in enumerate(lines[1:], start=1):
+            if not line:
+                offset += 1
+                continue
+            try:
+                op = json.loads(line)
+            except ValueError:
+                # a crash can only cut the last append short, drop it so
+                # the next append starts on a clean line
+                if index == len(lines) - 1:
+                    with open(self.path, 'r+b') as file:
+                        file.truncate(offset)
+                    break
+                raise
+            apply_op(blocks_data, op)
+            self.log_bytes += len(line) + 1
+            offset += len(line) + 1
+
+        return blocks_data
+
+    def needs_snapshot(self):
+        # compact once the log outgrows both the threshold and the snapshot
+        return (self.broken or
+                self.log_bytes > max(self.compact_bytes, self.snapshot_bytes))
+
+    def snapshot(self, blocks):
+        return self.serializer.snapshot(blocks)
+
+    def save(self, entries, ops):
+        if entries is None:
+            self.append(ops)
+            return
+
+        try:
+            self.write_snapshot(self.serializer.serialize(entries))
+        except BaseException:
+            self.serializer.invalidate()
+            raise
+
+    def append(self, ops):
+        if self.broken:
+            raise OSError(f"Journal needs a snapshot first: {self.path}")
+
+        text = ''.join(json.dumps(op) + '\n' for op in ops)
+        try:
+            with open(self.path, 'a', encoding='utf-8') as file:
+                file.write(text)
+                file.flush()
+                os.fsync(file.fileno())
+        except BaseException:
+            self.broken = True
+            raise
+        self.log_bytes += len(text.encode('utf-8'))
+
+    def compact(self, blocks_data):
+        self.write_snapshot(json.dumps(blocks_data))
+
+    def write_snapshot(self, blocks_json):
+        header = ('{"format": "%s", "version": 1, "blocks": %s}'
+                  % (JOURNAL_FORMAT, blocks_json))
+        atomic_write(self.path, header + '\n')
+        self.snapshot_bytes = len(header.encode('utf-8')) + 1
+        self.log_bytes = 0
+        self.broken = False
+
+
+def coalesce_op(ops, op):
+    # successive edits of the same field only need the final value
+    if (op['op'] == 'set' and ops and ops[-1]['op'] == 'set' and
+            ops[-1]['row'] == op['row'] and ops[-1]['field'] == op['field']):
+        ops[-1] = op
+    else:
+        ops.append(op)
+
+
+def import_json(json_path, journal_path):
+    with open(json_path, 'r') as file:
+        blocks_data = json.load(file)
+    JournalStore(journal_path).compact(blocks_data or [])
+
+
+def export_json(journal_path, json_path):
+    write_notebook(json_path, JournalStore(journal_path).load())
+
+
+def main():
+    # python NotebookStorage.py import notebook.json notebook.journal
+    # python NotebookStorage.py export notebook.journal notebook.json
+    command, source, destination = sys.argv[1:4]
+    if command == 'import':
+        import_json(source, destination)
+    elif command == 'export':
+        export_json(source, destination)
+    else:
+        raise SystemExit(f"Unknown command: {command}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,427 @@
+import bisect
+import gc
+import heapq
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+from Notebook import Notebook
+from NotebookStorage import JOURNAL_EXTENSION, atomic_write
+
+INDEX_FORMAT = 'cornell-index'
+INDEX_EXTENSION = '.index'
+
+NOTEBOOK_EXTENSIONS = ('.json', JOURNAL_EXTENSION)
+
+# a word in the title counts three times, in the cues twice
+FIELD_WEIGHTS = (('title', 3), ('cues', 2), ('notes', 1))
+
+# shorter last terms are matched exactly rather than as a prefix
+MIN_PREFIX_LENGTH = 2
+
+TOKEN = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return TOKEN.findall(text.lower())
+
+
+def block_terms(block):
+    # notes weigh 1, so their counts are the starting scores
+    terms = Counter(tokenize(block.notes))
+    for field, weight in FIELD_WEIGHTS:
+        if field != 'notes':
+            for term, count in Counter(tokenize(getattr(block, field))).items():
+                terms[term] += count * weight
+    return terms
+
+
+@contextmanager
+def collection_paused():
+    # building creates millions of small dicts that all stay alive, the
+    # cyclic collector would only walk them over and over
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def index_path(notebook_path):
+    # the index lives beside the notebook, lecture.json.index
+    return notebook_path + INDEX_EXTENSION
+
+
+def source_stamp(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class InvertedIndex:
+    def __init__(self):
+        # term to {document: score}, and document to its term scores so a
+        # changed document can be taken out again
+        self.postings = {}
+        self.documents = {}
+
+        # postings read from disk stay encoded until a query needs them
+        self.encoded = {}
+
+        # vocabulary in order for prefix queries, built on the first one
+        self.sorted_terms = None
+
+    def add(self, document, terms):
+        self.documents[document] = terms
+        for term, score in terms.items():
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = {}
+                if self.sorted_terms is not None:
+                    bisect.insort(self.sorted_terms, term)
+            posting[document] = score
+
+    def remove(self, document):
+        terms = self.documents.pop(document, None)
+        if terms is None:
+            return
+        for term in terms:
+            posting = self.postings[term]
+            del posting[document]
+            if not posting:
+                del self.postings[term]
+                if self.sorted_terms is not None:
+                    del self.sorted_terms[
+                        bisect.bisect_left(self.sorted_terms, term)]
+
+    def posting(self, term):
+        posting = self.postings.get(term)
+        if posting is None:
+            encoded = self.encoded.pop(term, None)
+            if encoded is None:
+                return {}
+            numbers = [int(number) for number in encoded.split(',')]
+            posting = self.postings[term] = dict(
+                zip(numbers[0::2], numbers[1::2]))
+        return posting
+
+    def decode(self):
+        # every posting and the documents they make up, to edit the index
+        for term in list(self.encoded):
+            for document, score in self.posting(term).items():
+                self.documents.setdefault(document, {})[term] = score
+
+    def prefix_posting(self, prefix):
+        if len(prefix) < MIN_PREFIX_LENGTH:
+            return self.posting(prefix)
+
+        if self.sorted_terms is None:
+            self.sorted_terms = sorted(set(self.postings) | set(self.encoded))
+        start = bisect.bisect_left(self.sorted_terms, prefix)
+        end = bisect.bisect_left(self.sorted_terms, prefix + '\uffff', start)
+
+        if end - start == 1:
+            return self.posting(self.sorted_terms[start])
+        merged = {}
+        for term in self.sorted_terms[start:end]:
+            for document, score in self.posting(term).items():
+                merged[document] = merged.get(document, 0) + score
+        return merged
+
+    def search(self, query, limit=None):
+        # documents holding every term, the last one as a prefix while the
+        # query is still being typed, best scores first
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        postings = [self.posting(term) for term in terms[:-1]]
+        postings.append(self.prefix_posting(terms[-1]))
+        postings.sort(key=len)
+
+        scores = dict(postings[0])
+        for posting in postings[1:]:
+            scores = {document: score + posting[document]
+                      for document, score in scores.items()
+                      if document in posting}
+            if not scores:
+                break
+
+        key = lambda hit: (-hit[1], hit[0])
+        if limit is not None:
+            return heapq.nsmallest(limit, scores.items(), key=key)
+        return sorted(scores.items(), key=key)
+
+
+class NotebookIndex:
+
+    # index of one notebook file, documents are rows at the time it was
+    # built, kept beside the notebook to search it without opening it
+    def __init__(self, notebook_path):
+        self.notebook_path = notebook_path
+        self.index = InvertedIndex()
+        self.titles = []
+        self.stamp = None
+
+    def build(self, blocks):
+        self.index = InvertedIndex()
+        self.titles = []
+        with collection_paused():
+            for row, block in enumerate(blocks):
+                self.index.add(row, block_terms(block))
+                self.titles.append(block.title)
+
+    def is_current(self):
+        return self.stamp == source_stamp(self.notebook_path)
+
+    def save(self):
+        self.stamp = source_stamp(self.notebook_path)
+        # each posting as one "row,score,row,score" string, so loading only
+        # parses the postings a query touches, terms in order so they need
+        # no sorting for prefix queries
+        postings = {}
+        for term in sorted(set(self.index.postings) | set(self.index.encoded)):
+            if term in self.index.postings:
+                postings[term] = ','.join(
+                    f"{row},{score}"
+                    for row, score in self.index.postings[term].items())
+            else:
+                postings[term] = self.index.encoded[term]
+        atomic_write(index_path(self.notebook_path), json.dumps({
+            'format': INDEX_FORMAT,
+            'version': 1,
+            'source': self.stamp,
+            'titles': self.titles,
+            'postings': postings,
+        }, separators=(',', ':')), fsync=False)
+
+    def load(self):
+        # False when there is no usable index beside the notebook
+        try:
+            with open(index_path(self.notebook_path), 'r',
+                      encoding='utf-8') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return False
+        if data.get('format') != INDEX_FORMAT or data.get('version') != 1:
+            return False
+
+        self.index = InvertedIndex()
+        self.index.encoded = data['postings']
+        self.index.sorted_terms = list(self.index.encoded)
+        self.titles = data['titles']
+        self.stamp = data['source']
+        return True
+
+    def update(self):
+        # load the saved index, or rebuild and save it when the notebook
+        # changed since it was written
+        if self.load() and self.is_current():
+            return False
+        self.build(Notebook.load(self.notebook_path))
+        self.save()
+        return True
+
+    def search(self, query, limit=None):
+        return [(self.notebook_path, row, self.titles[row], score)
+                for row, score in self.index.search(query, limit)]
+
+
+class BlockIndex:
+
+    # index of the open notebook, documents are block ids so rows can move
+    # without touching it, edited blocks are only reindexed when searched
+    def __init__(self):
+        self.index = InvertedIndex()
+        self.blocks = []
+        self.notebook_path = None
+        self.built = False
+        self.changed = set()
+        self.removed = set()
+
+        # whether the index beside the notebook is behind
+        self.modified = False
+        self.generation = 0
+
+    def reset(self, blocks, notebook_path=None):
+        # built on the first search, not while the notebook opens
+        self.index = InvertedIndex()
+        self.blocks = blocks
+        self.notebook_path = notebook_path
+        self.built = False
+        self.changed = set()
+        self.removed = set()
+        self.modified = False
+
+        # tells a build started for the previous notebook from this one
+        self.generation += 1
+
+    def mark_changed(self, block):
+        self.changed.add(block)
+        self.removed.discard(block.id)
+        self.modified = True
+
+    def mark_removed(self, block):
+        self.changed.discard(block)
+        self.removed.add(block.id)
+        self.modified = True
+
+    def snapshot(self):
+        # what build_index needs, taken on the gui thread so a worker can
+        # build while the blocks are edited, those edits stay marked and
+        # the refresh in install applies them
+        self.changed = set()
+        self.removed = set()
+        ids = [block.id for block in self.blocks]
+        saved_path = None if self.modified else self.notebook_path
+        return ids, Notebook.from_blocks(self.blocks), saved_path
+
+    @staticmethod
+    def build_index(ids, notebook, saved_path):
+        # returns the index and whether it was built from the blocks rather
+        # than the index saved beside the notebook
+        saved = None
+        if saved_path is not None:
+            saved = NotebookIndex(saved_path)
+            if not (saved.load() and saved.is_current() and
+                    len(saved.titles) == len(ids)):
+                saved = None
+
+        index = InvertedIndex()
+        with collection_paused():
+            if saved is not None:
+                # the saved rows are the rows the notebook was loaded with
+                saved.index.decode()
+                documents = saved.index.documents
+                for row, block_id in enumerate(ids):
+                    index.add(block_id, documents.get(row, {}))
+            else:
+                for block_id, block in zip(ids, notebook):
+                    index.add(block_id, block_terms(block))
+        return index, saved is None
+
+    def install(self, index, rebuilt):
+        self.index = index
+        self.built = True
+        if rebuilt and self.notebook_path is not None:
+            self.modified = True
+        self.refresh()
+
+    def build(self):
+        self.install(*self.build_index(*self.snapshot()))
+
+    def refresh(self):
+        if not self.built:
+            self.build()
+            return
+
+        for block_id in self.removed:
+            self.index.remove(block_id)
+        for block in self.changed:
+            self.index.remove(block.id)
+            self.index.add(block.id, block_terms(block))
+        self.changed = set()
+        self.removed = set()
+
+    def search(self, query, limit=None):
+        # [(block id, score)]
+        self.refresh()
+        return self.index.search(query, limit)
+
+    def save(self):
+        # written with rows in the current order, after the notebook itself
+        # has been saved, only when a search built it, the stale index
+        # beside the notebook is rebuilt by the next search that needs it
+        if self.notebook_path is None or not self.modified or not self.built:
+            return
+        if not os.path.exists(self.notebook_path):
+            return
+
+        self.refresh()
+        saved = NotebookIndex(self.notebook_path)
+        for row, block in enumerate(self.blocks):
+            saved.index.add(row, self.index.documents.get(block.id, {}))
+            saved.titles.append(block.title)
+        saved.save()
+        self.modified = False
+
+
+class FolderIndex:
+
+    # every notebook in a folder, each searched through its own index
+    def __init__(self, folder_path):
+        self.folder_path = folder_path
+        self.notebooks = {}
+
+        # files that are not notebooks, by the stamp they failed with
+        self.skipped = {}
+
+    def notebook_paths(self):
+        return sorted(
+            os.path.join(self.folder_path, file_name)
+            for file_name in os.listdir(self.folder_path)
+            if os.path.splitext(file_name)[1] in NOTEBOOK_EXTENSIONS)
+
+    def update(self, skip=()):
+        # returns how many notebook indexes had to be rebuilt
+        rebuilt = 0
+        paths = [path for path in self.notebook_paths() if path not in skip]
+        for path in paths:
+            try:
+                notebook = self.notebooks.get(path)
+                if notebook is not None and notebook.is_current():
+                    continue
+                stamp = source_stamp(path)
+                if self.skipped.get(path) == stamp:
+                    continue
+                notebook = NotebookIndex(path)
+                rebuilt += notebook.update()
+            except Exception as error:
+                # any other JSON file in the folder is skipped until it
+                # changes
+                print(f"Error indexing notebook: {path}\nError: {str(error)}")
+                self.notebooks.pop(path, None)
+                try:
+                    self.skipped[path] = source_stamp(path)
+                except OSError:
+                    pass
+                continue
+            self.skipped.pop(path, None)
+            self.notebooks[path] = notebook
+        for path in set(self.notebooks) - set(paths):
+            del self.notebooks[path]
+        return rebuilt
+
+    def search(self, query, limit=None):
+        # [(notebook path, row, title, score)] across the folder
+        hits = []
+        for notebook in self.notebooks.values():
+            hits.extend(notebook.search(query, limit))
+        hits.sort(key=lambda hit: -hit[3])
+        return hits[:limit] if limit is not None else hits
+
+
+def main():
+    # python SearchIndex.py folder "query terms"
+    folder_path, query = sys.argv[1:3]
+    folder = FolderIndex(folder_path)
+
+    start = time.perf_counter()
+    rebuilt = folder.update()
+    print(f"indexed {len(folder.notebooks)} notebooks ({rebuilt} rebuilt) "
+          f"in {(time.perf_counter() - start) * 1e3:.0f} ms")
+
+    start = time.perf_counter()
+    hits = folder.search(query, limit=20)
+    elapsed = time.perf_counter() - start
+    for path, row, title, score in hits:
+        print(f"{score:>5} {os.path.basename(path)}:{row} {title}")
+    print(f"{len(hits)} hits in {elapsed * 1e3:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
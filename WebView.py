@@ -0,0 +1,197 @@
+import json
+from PyQt5.QtCore import QFile, QIODevice, QObject, pyqtSignal, pyqtSlot
+from PyQt5.QtWebChannel import QWebChannel
+from PyQt5.QtWebEngineWidgets import QWebEngineScript, QWebEngineView
+
+# the web engine side of rendered cells, app.py imports this module only
+# when the first cell is rendered so startup never loads QtWebEngine
+
+
+# reports the page height to the view whenever the document resizes,
+# including late changes such as MathJax finishing its typesetting
+HEIGHT_REPORTER_JS = """
+    new QWebChannel(qt.webChannelTransport, function (channel) {
+        var reporter = channel.objects.height_reporter;
+        var report = function () {
+            reporter.report(document.documentElement.offsetHeight);
+        };
+        new ResizeObserver(report).observe(document.documentElement);
+        report();
+    });
+"""
+
+DOCUMENT_HEIGHT_JS = "document.documentElement.offsetHeight;"
+
+# rendered markdown is loaded inside this element so it can be patched
+CONTENT_ID = "cornell-content"
+
+# swaps only the top level elements that differ between the previous and
+# the new rendering, then typesets the math of the swapped ones, returns
+# -1 when the page cannot be patched and needs a reload
+PATCH_JS = """
+    var cornellChangedRange = function (before, after) {
+        var start = 0;
+        while (start < before.length && start < after.length &&
+               before[start] === after[start]) {
+            start++;
+        }
+        var end = 0;
+        while (end < before.length - start && end < after.length - start &&
+               before[before.length - 1 - end] ===
+               after[after.length - 1 - end]) {
+            end++;
+        }
+        return [start, end];
+    };
+
+    window.cornellPatch = function (beforeHtml, afterHtml) {
+        var container = document.getElementById("%s");
+        var parse = function (html) {
+            var template = document.createElement("template");
+            template.innerHTML = html;
+            return template.content;
+        };
+        var looseText = function (content) {
+            return Array.prototype.some.call(content.childNodes, function (node) {
+                return node.nodeType === Node.TEXT_NODE && node.textContent.trim();
+            });
+        };
+        var sources = function (content) {
+            return Array.prototype.map.call(content.children, function (node) {
+                return node.outerHTML;
+            });
+        };
+
+        var before = parse(beforeHtml);
+        var after = parse(afterHtml);
+        if (!container || looseText(before) || looseText(after) ||
+                before.children.length !== container.children.length) {
+            return -1;
+        }
+
+        var range = cornellChangedRange(sources(before), sources(after));
+        var start = range[0], end = range[1];
+        var current = Array.prototype.slice.call(container.children);
+        var anchor = current[current.length - end] || null;
+        for (var i = start; i < current.length - end; i++) {
+            container.removeChild(current[i]);
+        }
+        var incoming = Array.prototype.slice.call(
+            after.children, start, after.children.length - end);
+        incoming.forEach(function (node) {
+            container.insertBefore(node, anchor);
+        });
+
+        if (incoming.length && window.MathJax && MathJax.typesetPromise) {
+            MathJax.typesetPromise(incoming);
+        }
+        return incoming.length;
+    };
+""" % CONTENT_ID
+
+
+class HeightReporter(QObject):
+
+    heightReported = pyqtSignal(int)
+
+    @pyqtSlot(int)
+    def report(self, height):
+        self.heightReported.emit(height)
+
+
+class RenderedView(QWebEngineView):
+
+    heightChanged = pyqtSignal(int)
+
+    # patch a loaded page in place instead of reloading it, which keeps
+    # MathJax loaded and only typesets the changed elements
+    patch_updates = True
+
+    def __init__(self, parent=None):
+        super(RenderedView, self).__init__(parent)
+
+        # last height reported by the page, read without blocking
+        self.content_height = 100
+
+        # render key of the markdown on the page, None before the first load
+        self.content_key = None
+
+        # what the page was last loaded or patched with
+        self.head_html = None
+        self.body_html = None
+        self.base_url = None
+        self.page_ready = False
+
+        self.height_reporter = HeightReporter(self)
+        self.height_reporter.heightReported.connect(self.set_content_height)
+
+        channel = QWebChannel(self.page())
+        channel.registerObject("height_reporter", self.height_reporter)
+        self.page().setWebChannel(channel)
+
+        script = QWebEngineScript()
+        script.setName("height_reporter")
+        script.setSourceCode(qwebchannel_js() + HEIGHT_REPORTER_JS + PATCH_JS)
+        script.setInjectionPoint(QWebEngineScript.DocumentReady)
+        script.setWorldId(QWebEngineScript.MainWorld)
+        script.setRunsOnSubFrames(False)
+        self.page().scripts().insert(script)
+
+        # ask once more after loading in case the channel is not up yet
+        self.loadFinished.connect(
+            lambda ok: self.page().runJavaScript(
+                DOCUMENT_HEIGHT_JS, self.set_content_height))
+        self.loadFinished.connect(self.set_page_ready)
+
+    def set_page_ready(self, ok):
+        self.page_ready = ok
+
+    def show_html(self, head_html, body_html, content_key, base_url):
+        if content_key == self.content_key:
+            return
+
+        previous_body_html = self.body_html
+        self.content_key = content_key
+        self.body_html = body_html
+
+        if (self.patch_updates and self.page_ready and
+                previous_body_html is not None and head_html == self.head_html):
+            self.page().runJavaScript(
+                "cornellPatch(%s, %s);" % (
+                    json.dumps(previous_body_html), json.dumps(body_html)),
+                self.patch_finished)
+        else:
+            self.reload_html(head_html, body_html, base_url)
+
+    def reload_html(self, head_html, body_html, base_url):
+        self.head_html = head_html
+        self.base_url = base_url
+        self.page_ready = False
+        self.setHtml(
+            f'{head_html}<div id="{CONTENT_ID}">{body_html}</div>',
+            baseUrl=base_url)
+
+    def patch_finished(self, result):
+        if result is None or result < 0:
+            self.reload_html(self.head_html, self.body_html, self.base_url)
+
+    def set_content_height(self, height):
+        if height is None:
+            return
+        height = int(height)
+        if height != self.content_height:
+            self.content_height = height
+            self.heightChanged.emit(height)
+
+
+_qwebchannel_js = None
+
+
+def qwebchannel_js():
+    global _qwebchannel_js
+    if _qwebchannel_js is None:
+        file = QFile(":/qtwebchannel/qwebchannel.js")
+        file.open(QIODevice.ReadOnly)
+        _qwebchannel_js = bytes(file.readAll()).decode('utf-8')
+        file.close()
+    return _qwebchannel_js
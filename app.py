@@ -1,98 +1,969 @@
 import sys
 import os
-import json
+import time
+from collections import OrderedDict
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
 from PyQt5 import QtCore
-from PyQt5.QtCore import QEventLoop, Qt
+from PyQt5.QtCore import QAbstractListModel, QEvent, QModelIndex, QObject, QPoint, QRect, QTimer, Qt
 from PyQt5.QtWidgets import (
-    QAction, QApplication, QCheckBox, QDialog, QMenu, QSplitter, QToolButton, QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QLabel, QLineEdit, QTextEdit, QPushButton, QScrollArea, QFormLayout, QWidgetItem, QTextBrowser, QSpacerItem, QSizePolicy, QFileDialog, QMessageBox, QListWidget, QListWidgetItem, QListView, QAbstractItemView, QShortcut, QRadioButton, QComboBox
+    QAction, QApplication, QCheckBox, QDialog, QMenu, QSplitter, QToolButton, QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QLabel, QLineEdit, QTextEdit, QPushButton, QScrollArea, QFormLayout, QWidgetItem, QTextBrowser, QSpacerItem, QSizePolicy, QFileDialog, QMessageBox, QListWidget, QListWidgetItem, QListView, QAbstractItemView, QShortcut, QRadioButton, QComboBox, QStyle, QStyledItemDelegate, QStyleOption, QStyleOptionViewItem, QProgressDialog
 )
-from PyQt5.QtGui import QFontMetrics, QKeySequence, QTextCursor, QIcon, QColor
-from PyQt5.QtCore import QSize, pyqtSignal, QUrl
-from PyQt5.QtWebEngineWidgets import QWebEngineView
-from MarkdownEditor import MarkdownTextEdit
-import mistune
-
-class Block:
-    def __init__(self, title='', notes='', cues='', hierarchy=0, highlighted=0):
-        self.title = title
-        self.notes = notes
-        self.cues = cues
-        self.hierarchy = hierarchy
-        self.highlighted = highlighted
-
-    def to_dict(self):
-        return {
-            'title': self.title,
-            'notes': self.notes,
-            'cues': self.cues,
-            'hierarchy': self.hierarchy,
-            'highlighted': self.highlighted
-        }
-
-    @classmethod
-    def from_dict(cls, data):
-        return cls(**data)
-
-
-class ListWidget(QListWidget):
+from PyQt5.QtGui import QCursor, QFontMetrics, QKeySequence, QTextCursor, QColor
+from PyQt5.QtCore import QSize, pyqtSignal, pyqtSlot
+from Assets import assets
+from MarkdownEditor import KeyLatencyRecorder, MarkdownTextEdit
+from MarkdownExport import BLOCK_SEPARATOR, ExportOptions, export_markdown
+from MarkdownRenderer import open_disk_cache, render_key, render_markdown
+from Notebook import Block, Notebook
+from NotebookStorage import coalesce_op, open_store
+from SearchIndex import BlockIndex, FolderIndex
+
+class SaveScheduler(QObject):
+
+    # message of a save that failed, once until a save succeeds again
+    failed = pyqtSignal(str)
+
+    # emitted by the worker, queued back to the gui thread
+    save_error = pyqtSignal(str)
+
+    def __init__(self, snapshot, idle_ms=1000, parent=None):
+        super(SaveScheduler, self).__init__(parent)
+
+        # callable returning the blocks, the store copies out the changed
+        # ones on the gui thread before the worker serializes them
+        self.snapshot = snapshot
+
+        # JsonStore or JournalStore of the open notebook
+        self.store = None
+        self.dirty = False
+        self.suspended = 0
+
+        # block level edits waiting for a journaled store
+        self.pending_ops = []
+
+        # coalesce bursts of changes until the editor has been idle
+        self.idle_timer = QTimer(self)
+        self.idle_timer.setSingleShot(True)
+        self.idle_timer.setInterval(idle_ms)
+        self.idle_timer.timeout.connect(self.flush)
+
+        # a single worker keeps the writes, and compactions, in order
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.pending = None
+
+        self.failing = False
+        self.closed = False
+        self.save_error.connect(self.save_failed)
+
+    def set_idle_interval(self, idle_ms):
+        self.idle_timer.setInterval(idle_ms)
+
+    def set_store(self, store):
+        self.flush()
+        self.store = store
+
+    def suspend(self):
+        # changes made while suspended are not scheduled for saving
+        self.suspended += 1
+
+    def resume(self):
+        self.suspended -= 1
+
+    def mark_dirty(self, op=None):
+        if self.suspended or self.store is None:
+            return
+
+        if op is not None and self.store.journaled:
+            coalesce_op(self.pending_ops, op)
+
+        self.dirty = True
+        self.idle_timer.start()
+
+    def flush(self, wait=False):
+        self.idle_timer.stop()
+
+        if self.dirty and self.store is not None:
+            self.dirty = False
+            ops, self.pending_ops = self.pending_ops, []
+
+            # the journal only needs the whole notebook to compact
+            entries = None
+            if self.store.needs_snapshot():
+                entries = self.store.snapshot(self.snapshot())
+
+            self.pending = self.executor.submit(
+                self.store.save, entries, ops)
+            self.pending.add_done_callback(self.report_error)
+
+        if wait and self.pending is not None:
+            futures.wait([self.pending])
+
+    def close(self):
+        # returns the error of a last save that failed instead of raising,
+        # its queued signal would only arrive after the window is gone
+        self.closed = True
+        self.flush(wait=True)
+        self.executor.shutdown(wait=True)
+        if self.pending is not None:
+            return self.pending.exception()
+        return None
+
+    def report_error(self, future):
+        # runs on the worker
+        error = future.exception()
+        if error is not None:
+            print(f"Error saving file: {self.store.path}\nError: {str(error)}")
+            self.save_error.emit(str(error))
+        else:
+            self.failing = False
+
+    def save_failed(self, message):
+        if self.closed:
+            return
+        # the edits are still only in memory, they are written again after
+        # the usual idle interval, a journal rewrites its snapshot
+        self.dirty = True
+        self.idle_timer.start()
+        if not self.failing:
+            self.failing = True
+            self.failed.emit(message)
+
+
+class ExportTask(QObject):
+
+    # rows written so far and the total number of rows
+    progress = pyqtSignal(int, int)
+    # paths of the exported notes and cues files
+    finished = pyqtSignal(str, str)
+    failed = pyqtSignal(str)
+
     def __init__(self, parent=None):
-        super().__init__(parent)
+        super(ExportTask, self).__init__(parent)
+
+        # the files are written off the gui thread, the signals are queued
+        # back to it
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.pending = None
+
+    def running(self):
+        return self.pending is not None and not self.pending.done()
+
+    def start(self, notebook, base_path, options):
+        self.pending = self.executor.submit(
+            self.run, notebook, base_path, options)
+
+    def run(self, notebook, base_path, options):
+        try:
+            paths = export_markdown(
+                notebook, base_path, options, progress=self.progress.emit)
+        except Exception as error:
+            self.failed.emit(str(error))
+        else:
+            self.finished.emit(*paths)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+class SearchTask(QObject):
+
+    # the BlockIndex, its generation, the index built for it and whether
+    # that was built from the blocks
+    built = pyqtSignal(object, int, object, bool)
+    # the search it answers and the folder hits
+    # [(notebook path, row, title, score)]
+    found = pyqtSignal(int, object)
+
+    def __init__(self, parent=None):
+        super(SearchTask, self).__init__(parent)
+
+        # indexing runs off the gui thread, one job at a time, a folder
+        # index is only ever read and updated here
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.building = None
+
+    def build(self, block_index):
+        key = (block_index, block_index.generation)
+        if self.building == key:
+            return
+        self.building = key
+        self.executor.submit(
+            self.run_build, block_index, block_index.generation,
+            block_index.snapshot())
+
+    def run_build(self, block_index, generation, snapshot):
+        try:
+            index, rebuilt = BlockIndex.build_index(*snapshot)
+        except Exception as error:
+            print(f"Error indexing notebook: {block_index.notebook_path}\nError: {str(error)}")
+            index, rebuilt = None, True
+        self.built.emit(block_index, generation, index, rebuilt)
+
+    def search_folder(self, request, folder_index, query, skip):
+        self.executor.submit(
+            self.run_search_folder, request, folder_index, query, skip)
+
+    def run_search_folder(self, request, folder_index, query, skip):
+        try:
+            folder_index.update(skip=skip)
+            hits = folder_index.search(query, limit=50)
+        except Exception as error:
+            print(f"Error searching folder: {folder_index.folder_path}\nError: {str(error)}")
+            return
+        self.found.emit(request, hits)
+
+    def close(self):
+        # a long first indexing run is not waited for, its result is dropped
+        self.blockSignals(True)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class BlockViewState:
+    def __init__(self):
+        # row height once measured by a live widget
+        self.height = None
+        self.cues_mode = "edit"
+        self.notes_mode = "edit"
+
+        # whether the section this block starts is folded away
+        self.collapsed = False
+
+
+class BlocksModel(QAbstractListModel):
+
+    BlockRole = Qt.UserRole
+
+    def __init__(self, blocks, parent=None):
+        super(BlocksModel, self).__init__(parent)
+
+        # shares the list with MyApp.blocks
+        self.blocks = blocks
+        self.states = {block: BlockViewState() for block in blocks}
+
+        # block id to row, entries below valid_rows are known to be right,
+        # the rest is refreshed on the next lookup that needs it
+        self.rows = {}
+        self.valid_rows = 0
+
+        # used to estimate the height of rows that were never shown
+        self.line_height = 16
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.blocks)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        block = self.blocks[index.row()]
+
+        if role == self.BlockRole:
+            return block
+        if role == Qt.DisplayRole:
+            return block.title
+        if role == Qt.BackgroundRole:
+            if block.highlighted == 1:
+                return QColor(223, 199, 75, 76)
+            return QColor(255, 255, 255, 75)
+        if role == Qt.SizeHintRole:
+            return QSize(0, self.row_height(block))
+        return None
+
+    def flags(self, index):
+        # rows are dragged around in the outline, MyApp moves them itself
+        if not index.isValid():
+            return Qt.ItemIsDropEnabled
+        return super(BlocksModel, self).flags(index) | Qt.ItemIsDragEnabled
+
+    def supportedDropActions(self):
+        return Qt.MoveAction
+
+    def block(self, row):
+        return self.blocks[row]
+
+    def row_of(self, block):
+        return self.row_of_id(block.id)
+
+    def row_of_id(self, block_id):
+        row = self.rows.get(block_id)
+        if row is not None and row < self.valid_rows:
+            return row
+
+        for row in range(self.valid_rows, len(self.blocks)):
+            self.rows[self.blocks[row].id] = row
+        self.valid_rows = len(self.blocks)
+
+        return self.rows[block_id]
+
+    def invalidate_rows(self, row):
+        # rows from here on have shifted
+        self.valid_rows = min(self.valid_rows, row)
+
+    def state(self, block):
+        return self.states.get(block)
+
+    def row_height(self, block):
+        state = self.states[block]
+        if state.height is None:
+            # mirror BlockNotesCuesWidget.auto_resize without building a widget
+            lines = max(block.notes.count('\n'), block.cues.count('\n')) + 1
+            widget_height = min(max(lines * self.line_height + 30, 100), 600)
+            return widget_height + 30 + 30 + 10
+        return state.height
+
+    def has_children(self, row):
+        # the rows below it with a deeper hierarchy make up its section
+        return (row + 1 < len(self.blocks) and
+                self.blocks[row + 1].hierarchy > self.blocks[row].hierarchy)
+
+    def section_end(self, row):
+        # the row after the last one of the section row starts
+        level = self.blocks[row].hierarchy
+        end = row + 1
+        while end < len(self.blocks) and self.blocks[end].hierarchy > level:
+            end += 1
+        return end
+
+    def section_rows(self, row):
+        # rows of the sections row lies in, innermost first
+        level = self.blocks[row].hierarchy
+        for parent in range(row - 1, -1, -1):
+            if level == 0:
+                break
+            if self.blocks[parent].hierarchy < level:
+                level = self.blocks[parent].hierarchy
+                yield parent
+
+    def collapse_to(self, level):
+        # fold every section starting at level or deeper
+        for row, block in enumerate(self.blocks):
+            self.states[block].collapsed = (
+                block.hierarchy >= level and self.has_children(row))
+
+    def hidden_blocks(self):
+        # blocks inside a collapsed section
+        hidden = set()
+        collapsed_level = None
+        for row, block in enumerate(self.blocks):
+            if collapsed_level is not None and block.hierarchy > collapsed_level:
+                hidden.add(block)
+                continue
+            collapsed_level = None
+            if self.states[block].collapsed and self.has_children(row):
+                collapsed_level = block.hierarchy
+        return hidden
+
+    def set_row_height(self, block, height):
+        state = self.states.get(block)
+        if state is None or state.height == height:
+            return False
+        state.height = height
+        return True
+
+    def insert_block(self, row, block):
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.blocks.insert(row, block)
+        self.states[block] = BlockViewState()
+        self.invalidate_rows(row)
+        self.endInsertRows()
+
+    def remove_block(self, row):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        block = self.blocks.pop(row)
+        self.states.pop(block, None)
+        self.rows.pop(block.id, None)
+        self.invalidate_rows(row)
+        self.endRemoveRows()
+        return block
+
+    def move_blocks(self, row, count, destination):
+        self.beginMoveRows(
+            QModelIndex(), row, row + count - 1, QModelIndex(), destination)
+
+        moved = self.blocks[row:row + count]
+        del self.blocks[row:row + count]
+        if destination > row:
+            destination -= count
+        self.blocks[destination:destination] = moved
+
+        self.invalidate_rows(min(row, destination))
+        self.endMoveRows()
+
+    def reset_blocks(self, blocks):
+        self.beginResetModel()
+        self.blocks.clear()
+        self.blocks.extend(blocks)
+        self.states = {block: BlockViewState() for block in self.blocks}
+        self.rows = {}
+        self.valid_rows = 0
+        self.endResetModel()
+
+    def block_changed(self, row):
+        index = self.index(row, 0)
+        self.dataChanged.emit(index, index)
+
+
+class BlockNotesCuesDelegate(QStyledItemDelegate):
+    def paint(self, painter, option, index):
+        view = self.parent()
+        block = index.data(BlocksModel.BlockRole)
+
+        painter.fillRect(option.rect, index.data(Qt.BackgroundRole))
+
+        # live rows are covered by their widget
+        if block in view.live_widgets:
+            return
+
+        snapshot = view.snapshots.get(block)
+        if snapshot is not None and snapshot.width() == option.rect.width():
+            painter.drawPixmap(option.rect.topLeft(), snapshot)
+            return
+
+        # rows that were never shown only get their plain text
+        text_rect = option.rect.adjusted(10, 40, -10, -10)
+        cues_rect = QRect(text_rect)
+        cues_rect.setWidth(text_rect.width() // 4)
+        notes_rect = QRect(text_rect)
+        notes_rect.setLeft(cues_rect.right() + 10)
+
+        painter.save()
+        painter.setClipRect(option.rect)
+        painter.drawText(cues_rect, Qt.TextWordWrap, block.cues)
+        painter.drawText(notes_rect, Qt.TextWordWrap, block.notes)
+        painter.restore()
+
+
+class NotebookView(QListView):
+
+    currentRowChanged = pyqtSignal(int)
+
+    def __init__(self, widget_factory, parent=None):
+        super(NotebookView, self).__init__(parent)
+
+        # builds a BlockNotesCuesWidget whenever the pool runs dry
+        self.widget_factory = widget_factory
 
         # Adjust the scroll bar properties for smoother scrolling
         self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setMouseTracking(True)
+
+        self.setItemDelegate(BlockNotesCuesDelegate(self))
+
+        # widgets bound to the visible blocks and spare ones to recycle
+        self.live_widgets = {}
+        self.spare_widgets = []
+        self.max_spare_widgets = 4
+
+        # last picture of rows that scrolled out of view
+        self.snapshots = OrderedDict()
+        self.max_snapshots = 64
+
+    def setModel(self, model):
+        super(NotebookView, self).setModel(model)
+
+        model.line_height = QFontMetrics(self.font()).lineSpacing()
+        self.selectionModel().currentRowChanged.connect(
+            lambda current, previous: self.currentRowChanged.emit(current.row()))
+
+    def currentRow(self):
+        return self.currentIndex().row()
+
+    def setCurrentRow(self, row):
+        self.setCurrentIndex(self.model().index(row, 0))
+
+    def visible_rows(self):
+        count = self.model().rowCount()
+        if count == 0:
+            return range(0)
+
+        first = self.indexAt(QPoint(1, 0)).row()
+        last = self.indexAt(QPoint(1, self.viewport().height() - 1)).row()
+        if first < 0:
+            first = 0
+        if last < 0:
+            last = count - 1
+
+        # keep one row of margin on either side, rows of collapsed
+        # sections never get a widget
+        return [row for row in range(max(first - 1, 0), min(last + 2, count))
+                if not self.isRowHidden(row)]
 
+    def sync_widgets(self):
+        model = self.model()
+        if model is None:
+            return
+
+        wanted = {model.block(row): row for row in self.visible_rows()}
+
+        for block in [b for b in self.live_widgets if b not in wanted]:
+            self.release_widget(block)
+
+        for block, row in wanted.items():
+            widget = self.live_widgets.get(block)
+            if widget is None:
+                widget = self.acquire_widget(block)
+            rect = self.visualRect(model.index(row, 0))
+            widget.setGeometry(
+                rect.x(), rect.y(), rect.width(), widget.height())
+
+    def acquire_widget(self, block):
+        if self.spare_widgets:
+            widget = self.spare_widgets.pop()
+        else:
+            widget = self.widget_factory()
+            widget.setParent(self.viewport())
+
+        state = self.model().state(block)
+        widget.bind(block, state.cues_mode, state.notes_mode)
+        widget.show()
+
+        self.live_widgets[block] = widget
+        self.snapshots.pop(block, None)
+        self.update_row_height(widget)
+        return widget
+
+    def release_widget(self, block):
+        widget = self.live_widgets.pop(block)
+
+        state = self.model().state(block)
+        if state is not None:
+            # remember the render/edit mode and the look of the row
+            state.cues_mode = widget.cues_current_mode
+            state.notes_mode = widget.notes_current_mode
+            if widget.isVisible():
+                self.snapshots[block] = widget.grab()
+                while len(self.snapshots) > self.max_snapshots:
+                    self.snapshots.popitem(last=False)
+
+        widget.hide()
+        widget.unbind()
+
+        if len(self.spare_widgets) < self.max_spare_widgets:
+            self.spare_widgets.append(widget)
+        else:
+            widget.deleteLater()
+
+    def update_row_height(self, widget):
+        if self.model().set_row_height(widget.block, widget.height() + 10):
+            self.scheduleDelayedItemsLayout()
+
+    def doItemsLayout(self):
+        super(NotebookView, self).doItemsLayout()
+        self.sync_widgets()
+
+    def updateGeometries(self):
+        super(NotebookView, self).updateGeometries()
+        self.sync_widgets()
+
+    def scrollContentsBy(self, dx, dy):
+        super(NotebookView, self).scrollContentsBy(dx, dy)
+        self.sync_widgets()
+
+
+class OutlineDelegate(QStyledItemDelegate):
+
+    # the size of a BlockTitleWidget row
+    row_size = QSize(130, 90)
+
+    def sizeHint(self, option, index):
+        return self.row_size
+
+    def paint(self, painter, option, index):
+        view = self.parent()
+
+        option = QStyleOptionViewItem(option)
+        self.initStyleOption(option, index)
+        view.style().drawPrimitive(
+            QStyle.PE_PanelItemViewItem, option, painter, view)
+
+        block = index.data(BlocksModel.BlockRole)
+        model = index.model()
+        if model.has_children(index.row()):
+            arrow = QStyleOption()
+            arrow.rect = view.branch_rect(option.rect, block)
+            arrow.palette = option.palette
+            arrow.state = QStyle.State_Enabled
+            view.style().drawPrimitive(
+                QStyle.PE_IndicatorArrowRight if model.state(block).collapsed
+                else QStyle.PE_IndicatorArrowDown, arrow, painter, view)
+
+        # the row with the title widget is covered by it
+        if block is view.title_block:
+            return
+
+        # the same places the title edit and buttons take in the widget
+        left = view.content_left(option.rect, block) + 10
+        top = option.rect.top() + 10
+        title_rect = QRect(left, top, 120, 30)
+
+        painter.save()
+        painter.setPen(QColor(127, 127, 127))
+        painter.drawRect(title_rect.adjusted(0, 0, -1, -1))
+        painter.setPen(option.palette.text().color())
+        painter.drawText(
+            title_rect.adjusted(5, 0, -5, 0), Qt.AlignLeft | Qt.AlignVCenter,
+            option.fontMetrics.elidedText(
+                index.data(Qt.DisplayRole), Qt.ElideRight,
+                title_rect.width() - 10))
+        for column, icon_name in enumerate(BlockTitleWidget.icon_names):
+            assets().icon(icon_name).paint(
+                painter, QRect(left + column * 33 + 7, top + 47, 16, 16))
+        painter.restore()
+
+
+class OutlineView(QListView):
+
+    currentRowChanged = pyqtSignal(int)
+
+    # the block of the row whose title widget or arrow was used
+    titleEdited = pyqtSignal(object, str)
+    sectionToggled = pyqtSignal(object)
+    insertClicked = pyqtSignal(object)
+    removeClicked = pyqtSignal(object)
+    highlightClicked = pyqtSignal(object)
+
+    def __init__(self, parent=None):
+        super(OutlineView, self).__init__(parent)
+
+        # rows are painted, one BlockTitleWidget follows the hovered row,
+        # or stays on the row whose title is being edited
+        self.title_block = None
+        self.title_widget = BlockTitleWidget(self.viewport())
+        self.title_widget.hide()
+
+        # Adjust the scroll bar properties for smoother scrolling
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
         self.setMouseTracking(True)
 
+        # every row is as high as the first, nothing else is measured
+        self.setUniformItemSizes(True)
+        self.setItemDelegate(OutlineDelegate(self))
+
+        title_edit = self.title_widget.block_title_lineedit
+        title_edit.textEdited.connect(
+            lambda text: self.titleEdited.emit(self.title_block, text))
+        title_edit.editingFinished.connect(self.title_editing_finished)
+        self.title_widget.insert_button.clicked.connect(
+            lambda checked: self.insertClicked.emit(self.title_block))
+        self.title_widget.remove_button.clicked.connect(
+            lambda checked: self.removeClicked.emit(self.title_block))
+        self.title_widget.highlight_button.clicked.connect(
+            lambda checked: self.highlightClicked.emit(self.title_block))
+
+    def setModel(self, model):
+        super(OutlineView, self).setModel(model)
+
+        self.selectionModel().currentRowChanged.connect(
+            lambda current, previous: self.currentRowChanged.emit(current.row()))
+
+    def currentRow(self):
+        return self.currentIndex().row()
+
+    def setCurrentRow(self, row):
+        self.setCurrentIndex(self.model().index(row, 0))
+
+    # pixels per hierarchy level, deeper levels stay at the last one
+    indentation = 12
+    max_indent_level = 3
+
+    def indent(self, block):
+        return min(block.hierarchy, self.max_indent_level) * self.indentation
+
+    def branch_rect(self, rect, block):
+        # the arrow that folds a section, left of its title
+        return QRect(rect.left() + self.indent(block), rect.top() + 10,
+                     self.indentation, 30)
+
+    def content_left(self, rect, block):
+        return rect.left() + self.indent(block) + self.indentation
+
+    def editing_title(self):
+        return self.title_widget.block_title_lineedit.hasFocus()
+
+    def title_row(self):
+        # -1 once the block of the title widget has been removed
+        if (self.title_block is None or
+                self.model().state(self.title_block) is None):
+            return -1
+        return self.model().row_of(self.title_block)
+
+    def bind_title_widget(self, row):
+        block = self.model().block(row) if row >= 0 else None
+        if block is not self.title_block:
+            self.title_block = block
+            if block is not None:
+                title_edit = self.title_widget.block_title_lineedit
+                title_edit.setText(block.title)
+                title_edit.setCursorPosition(0)
+            self.viewport().update()
+        self.sync_title_widget()
+
+    def sync_title_widget(self):
+        row = self.title_row()
+        if row < 0:
+            self.title_block = None
+            self.title_widget.hide()
+            return
+
+        rect = self.visualRect(self.model().index(row, 0))
+        self.title_widget.setGeometry(
+            self.content_left(rect, self.title_block), rect.y(),
+            self.title_widget.width(), rect.height())
+        self.title_widget.show()
+
+    def title_editing_finished(self):
+        if not self.underMouse():
+            self.bind_title_widget(-1)
+
+    def mousePressEvent(self, event):
+        index = self.indexAt(event.pos())
+        if index.isValid() and self.model().has_children(index.row()):
+            block = self.model().block(index.row())
+            if self.branch_rect(
+                    self.visualRect(index), block).contains(event.pos()):
+                self.sectionToggled.emit(block)
+                return
+        super(OutlineView, self).mousePressEvent(event)
+
+    def keyPressEvent(self, event):
+        # Left folds the current section, Right unfolds it
+        row = self.currentRow()
+        if (event.key() in (Qt.Key_Left, Qt.Key_Right) and row >= 0 and
+                self.model().has_children(row)):
+            block = self.model().block(row)
+            if self.model().state(block).collapsed != (
+                    event.key() == Qt.Key_Left):
+                self.sectionToggled.emit(block)
+            return
+        super(OutlineView, self).keyPressEvent(event)
+
+    def mouseMoveEvent(self, event):
+        super(OutlineView, self).mouseMoveEvent(event)
+        if not self.editing_title():
+            self.bind_title_widget(self.indexAt(event.pos()).row())
+
+    def leaveEvent(self, event):
+        super(OutlineView, self).leaveEvent(event)
+        if not self.editing_title():
+            self.bind_title_widget(-1)
+
+    def currentChanged(self, current, previous):
+        super(OutlineView, self).currentChanged(current, previous)
+        # moving through the rows with the keyboard
+        if self.hasFocus() and not self.editing_title():
+            self.bind_title_widget(current.row())
+
     def dragMoveEvent(self, event):
-        if ((target := self.row(self.itemAt(event.pos()))) ==
-            (current := self.currentRow()) or
-                (current == self.count() - 1 and target == -1)):
+        selected = [index.row() for index in self.selectedIndexes()]
+        if ((target := self.indexAt(event.pos()).row()) ==
+            (current := self.currentRow()) or target in selected or
+                (current == self.model().rowCount() - 1 and target == -1)):
             event.ignore()
         else:
-            super().dragMoveEvent(event)
+            super(OutlineView, self).dragMoveEvent(event)
+
+    def doItemsLayout(self):
+        super(OutlineView, self).doItemsLayout()
+        self.sync_title_widget()
+
+    def updateGeometries(self):
+        super(OutlineView, self).updateGeometries()
+        self.sync_title_widget()
+
+    def scrollContentsBy(self, dx, dy):
+        super(OutlineView, self).scrollContentsBy(dx, dy)
+        # a wheel scroll moves other rows under the pointer
+        if self.underMouse() and not self.editing_title():
+            self.bind_title_widget(self.indexAt(
+                self.viewport().mapFromGlobal(QCursor.pos())).row())
+        else:
+            self.sync_title_widget()
+
+
+def create_browser():
+    # QtWebEngine is only loaded once the first cell is rendered
+    from WebView import RenderedView
+
+    browser = RenderedView()
+    # set attribute for the browser so it can be deleted when exiting the application
+    browser.setAttribute(QtCore.Qt.WA_DeleteOnClose)
+    return browser
+
+
+class LivePreview(QObject):
+
+    # render key and html of the newest rendering of the text
+    rendered = pyqtSignal(object, str)
+
+    # delivered from the worker thread, queued to the gui thread
+    finished = pyqtSignal(int, object, str)
+
+    # one worker renders for every cell, so a slow parse never holds up
+    # typing in the editors
+    executor = None
+
+    def __init__(self, interval_ms=150, parent=None):
+        super(LivePreview, self).__init__(parent)
+
+        self.text = None
+
+        # every render request gets a new generation, results of older
+        # generations are superseded and dropped
+        self.generation = 0
+        self.pending = None
+
+        # render at most once per interval however fast the user types,
+        # the last change is always rendered once the timer fires
+        self.throttle_timer = QTimer(self)
+        self.throttle_timer.setSingleShot(True)
+        self.throttle_timer.setInterval(interval_ms)
+        self.throttle_timer.timeout.connect(self.render)
+
+        self.finished.connect(self.deliver)
+
+    def schedule(self, text):
+        self.text = text
+        if not self.throttle_timer.isActive():
+            self.throttle_timer.start()
+
+    def render(self):
+        self.generation += 1
+
+        # a request still waiting for the worker is not needed any more
+        if self.pending is not None:
+            self.pending.cancel()
+
+        if LivePreview.executor is None:
+            LivePreview.executor = ThreadPoolExecutor(max_workers=1)
+        self.pending = LivePreview.executor.submit(
+            self.run, self.generation, self.text)
+
+    def run(self, generation, text):
+        if generation != self.generation:
+            return
+        html = render_markdown(text)
+        self.finished.emit(generation, render_key(text), html)
+
+    def deliver(self, generation, content_key, html):
+        if generation == self.generation:
+            self.rendered.emit(content_key, html)
+
+    def stop(self):
+        self.throttle_timer.stop()
+        self.generation += 1
+        if self.pending is not None:
+            self.pending.cancel()
+            self.pending = None
+
+
+class BrowserPool(QObject):
+    def __init__(self, max_spare_browsers=4, parent=None):
+        super(BrowserPool, self).__init__(parent)
+
+        # browsers handed back by cells that went back to edit mode
+        self.spare_browsers = []
+        self.max_spare_browsers = max_spare_browsers
+
+    def acquire(self, content_key=None):
+        # a spare browser still showing the same content needs no reload,
+        # as when a rendered cell scrolls back into view
+        for index, browser in enumerate(self.spare_browsers):
+            if browser.content_key == content_key:
+                return self.spare_browsers.pop(index)
+        if self.spare_browsers:
+            return self.spare_browsers.pop()
+        return create_browser()
+
+    def release(self, browser):
+        browser.hide()
+        browser.setParent(None)
+
+        if len(self.spare_browsers) < self.max_spare_browsers:
+            self.spare_browsers.append(browser)
+        else:
+            browser.deleteLater()
 
 
 class BlockNotesCuesWidget(QWidget):
-    def __init__(self, parent=None):
+
+    # emitted once auto_resize has changed the height of the widget
+    resized = pyqtSignal()
+
+    def __init__(self, browser_pool=None, parent=None):
         super(BlockNotesCuesWidget, self).__init__(parent)
 
+        # the block currently shown, widgets are recycled between blocks
+        self.block = None
+
+        # browsers are only created once a side is first rendered, with a
+        # pool they are shared with other cells while in edit mode
+        self.browser_pool = browser_pool
+
         # cues
         self.cues_render_edit_button = QPushButton("Render")
 
+        self.cues_live_button = QPushButton("Live")
+        self.cues_live_button.setCheckable(True)
+        self.cues_live_button.toggled.connect(
+            lambda live: self.set_live("cues", live))
+
         self.cues_edit = MarkdownTextEdit()
         self.cues_edit.setObjectName("CuesEdit")
-        self.cues_edit.textChanged.connect(self.auto_resize)
+        self.cues_edit.heightChanged.connect(self.schedule_resize)
+        self.cues_edit.textChanged.connect(
+            lambda: self.update_preview("cues"))
+
+        self.cues_browser = None
 
-        self.cues_browser = QWebEngineView()
-        # set attribute for the browser so it can be deleted when exiting the application
-        self.cues_browser.setAttribute(QtCore.Qt.WA_DeleteOnClose)
+        # rendered next to the editor while typing in live mode
+        self.cues_preview = None
+        self.cues_live_preview = LivePreview(parent=self)
+        self.cues_live_preview.rendered.connect(
+            lambda content_key, html: self.show_preview(
+                "cues", content_key, html))
 
         # notes
         self.notes_render_edit_button = QPushButton("Render")
 
+        self.notes_live_button = QPushButton("Live")
+        self.notes_live_button.setCheckable(True)
+        self.notes_live_button.toggled.connect(
+            lambda live: self.set_live("notes", live))
+
         self.notes_edit = MarkdownTextEdit()
         self.notes_edit.setObjectName("NotesEdit")
-        self.notes_edit.textChanged.connect(self.auto_resize)
+        self.notes_edit.heightChanged.connect(self.schedule_resize)
+        self.notes_edit.textChanged.connect(
+            lambda: self.update_preview("notes"))
 
-        self.notes_browser = QWebEngineView()
-        # set attribute for the browser so it can be deleted when exiting the application
-        self.notes_browser.setAttribute(QtCore.Qt.WA_DeleteOnClose)
+        self.notes_browser = None
+
+        # rendered next to the editor while typing in live mode
+        self.notes_preview = None
+        self.notes_live_preview = LivePreview(parent=self)
+        self.notes_live_preview.rendered.connect(
+            lambda content_key, html: self.show_preview(
+                "notes", content_key, html))
 
         # set widget height
         # edits
         self.notes_edit.setFixedHeight(100)
         self.cues_edit.setFixedHeight(100)
 
-        # browsers
-        self.notes_browser.setFixedHeight(100)
-        self.cues_browser.setFixedHeight(100)
-
-        self.cues_browser.setMaximumHeight(600)
-        self.notes_browser.setMaximumHeight(600)
-
         # buttons
         self.notes_render_edit_button.setFixedHeight(30)
         self.cues_render_edit_button.setFixedHeight(30)
+        self.notes_live_button.setFixedHeight(30)
+        self.cues_live_button.setFixedHeight(30)
+
+        # resize once per event loop tick however many changes arrive
+        self.resize_timer = QTimer(self)
+        self.resize_timer.setSingleShot(True)
+        self.resize_timer.setInterval(0)
+        self.resize_timer.timeout.connect(self.auto_resize)
 
         # current mode
         self.cues_current_mode = "edit"
@@ -107,11 +978,24 @@ class BlockNotesCuesWidget(QWidget):
             QKeySequence("Ctrl + Return"), self)
 
         # arrange layout
+        cues_buttons_layout = QHBoxLayout()
+        cues_buttons_layout.addWidget(self.cues_render_edit_button, 1)
+        cues_buttons_layout.addWidget(self.cues_live_button)
+        notes_buttons_layout = QHBoxLayout()
+        notes_buttons_layout.addWidget(self.notes_render_edit_button, 1)
+        notes_buttons_layout.addWidget(self.notes_live_button)
+
+        # the live preview is added next to the editor
+        self.cues_area_layout = QHBoxLayout()
+        self.cues_area_layout.addWidget(self.cues_edit)
+        self.notes_area_layout = QHBoxLayout()
+        self.notes_area_layout.addWidget(self.notes_edit)
+
         notes_cues_layout = QGridLayout()
-        notes_cues_layout.addWidget(self.cues_render_edit_button, 0, 0)
-        notes_cues_layout.addWidget(self.cues_edit, 1, 0)
-        notes_cues_layout.addWidget(self.notes_render_edit_button, 0, 1)
-        notes_cues_layout.addWidget(self.notes_edit, 1, 1)
+        notes_cues_layout.addLayout(cues_buttons_layout, 0, 0)
+        notes_cues_layout.addLayout(self.cues_area_layout, 1, 0)
+        notes_cues_layout.addLayout(notes_buttons_layout, 0, 1)
+        notes_cues_layout.addLayout(self.notes_area_layout, 1, 1)
 
         # set sizes
         # column width ratio
@@ -122,66 +1006,29 @@ class BlockNotesCuesWidget(QWidget):
 
         self.setLayout(notes_cues_layout)
 
-        # set html contents
-        with open('./head.html', 'r') as f:
-            self.head_html = f.read()
-            f.close()
-        
-        # set baseurl
-        self.baseurl = QUrl.fromLocalFile(
-            os.path.dirname(os.path.abspath(__file__)) + '/')
-        print(self.baseurl)
-
-    def calculate_html_height(self, view):
-
-        # js_code = """
-                    # function documentHeight() {
-                        # var body = document.body;
-                        # var html = document.documentElement;
-                        # return Math.max(
-                            # body.scrollHeight, 
-                            # body.offsetHeight,
-                            # html.clientHeight, 
-                            # html.scrollHeight, 
-                            # html.offsetHeight
-                        # );
-                    # }
-                    # documentHeight();
-                # """
-        js_code = """
-                    function documentHeight() {
-                        var body = document.body;
-                        var html = document.documentElement;
-                        return html.offsetHeight;
-                    }
-                    documentHeight();
-                """
-        
-        result_list = []
-        loop = QEventLoop()
-
-        view.page().runJavaScript(js_code, lambda result: (
-            result_list.append(result), loop.quit()))
-        loop.exec_()
-        return result_list
-
     def get_current_widget_height(self, widget, widget_mode):
 
         if widget_mode == "edit":
-            font = widget.document().defaultFont()
-            fontMetrics = QFontMetrics(font)
-            # Measure the size of the text
-            edit_size = fontMetrics.size(
-                0, widget.toPlainText())
-            edit_height = edit_size.height()
-            return int(edit_height) + 30
+            # kept up to date by the document layout
+            return widget.content_height
 
         elif widget_mode == "browser":
-            # Usage:
-            result_list = self.calculate_html_height(widget)
-            return int(result_list[0])
+            # kept up to date by the page itself
+            return widget.content_height
+
+        elif widget_mode == "live":
+            # the editor with its preview next to it
+            preview = (self.cues_preview if widget is self.cues_edit
+                       else self.notes_preview)
+            return max(self.get_current_widget_height(widget, "edit"),
+                       preview.content_height)
+
+    def schedule_resize(self):
+        self.resize_timer.start()
 
     def auto_resize(self):
+        self.resize_timer.stop()
+        previous_height = self.height()
 
         notes_height = self.get_current_widget_height(
             self.notes_current_widget, self.notes_current_mode)
@@ -196,33 +1043,170 @@ class BlockNotesCuesWidget(QWidget):
         if self.widget_height >= 600:
             self.widget_height = 600
 
-        if self.notes_current_mode == "edit":
-            self.notes_edit.setFixedHeight(self.widget_height)
-        else:
+        if self.notes_current_mode == "browser":
             self.notes_browser.setMaximumHeight(self.widget_height)
-        if self.cues_current_mode == "edit":
-            self.cues_edit.setFixedHeight(self.widget_height)
         else:
+            self.notes_edit.setFixedHeight(self.widget_height)
+        if self.notes_current_mode == "live":
+            self.notes_preview.setMaximumHeight(self.widget_height)
+        if self.cues_current_mode == "browser":
             self.cues_browser.setMaximumHeight(self.widget_height)
+        else:
+            self.cues_edit.setFixedHeight(self.widget_height)
+        if self.cues_current_mode == "live":
+            self.cues_preview.setMaximumHeight(self.widget_height)
 
         self.setFixedHeight(
             self.widget_height +
             self.cues_render_edit_button.height() + 30)
 
-    def markdown_to_html(self, markdown_text):
-        markdown = mistune.create_markdown(
-            renderer=mistune.HTMLRenderer(),
-            plugins=['strikethrough', 'table', 'url', 'task_lists', 'math', 'ruby', 'spoiler'])
-        html_content = self.head_html + markdown(markdown_text)
-        return html_content
+        if self.height() != previous_height:
+            self.resized.emit()
+
+    def acquire_browser(self, content_key=None):
+        if self.browser_pool is not None:
+            browser = self.browser_pool.acquire(content_key)
+        else:
+            browser = create_browser()
+
+        browser.setParent(self)
+        browser.setFixedHeight(100)
+        browser.setMaximumHeight(600)
+        browser.heightChanged.connect(self.schedule_resize)
+        return browser
+
+    def release_browser(self, browser):
+        browser.heightChanged.disconnect(self.schedule_resize)
+        self.browser_pool.release(browser)
+
+    def unbind(self):
+        # go back to edit mode, which also returns shared browsers
+        self.cues_edit.blockSignals(True)
+        self.notes_edit.blockSignals(True)
+
+        if self.cues_current_mode == "browser":
+            self.replace_widget("cues", "browser", self.block.cues)
+        elif self.cues_current_mode == "live":
+            self.set_live("cues", False)
+        if self.notes_current_mode == "browser":
+            self.replace_widget("notes", "browser", self.block.notes)
+        elif self.notes_current_mode == "live":
+            self.set_live("notes", False)
+
+        self.cues_edit.blockSignals(False)
+        self.notes_edit.blockSignals(False)
+
+        self.block = None
+
+    def bind(self, block, cues_mode="edit", notes_mode="edit"):
+        if self.block is not None:
+            self.unbind()
+
+        self.block = block
+
+        # loading a block is not an edit
+        self.cues_edit.blockSignals(True)
+        self.notes_edit.blockSignals(True)
+
+        self.cues_edit.setPlainText(block.cues)
+        self.notes_edit.setPlainText(block.notes)
+
+        if cues_mode == "browser":
+            self.replace_widget("cues", "edit", block.cues)
+        elif cues_mode == "live":
+            self.set_live("cues", True)
+        if notes_mode == "browser":
+            self.replace_widget("notes", "edit", block.notes)
+        elif notes_mode == "live":
+            self.set_live("notes", True)
+
+        self.cues_edit.blockSignals(False)
+        self.notes_edit.blockSignals(False)
+
+        self.auto_resize()
+
+    def show_rendered(self, browser, content_key, text):
+        # only render when the content changed since the page was loaded,
+        # a loaded page is patched rather than reloaded
+        if browser.content_key != content_key:
+            browser.show_html(assets().page_head(), render_markdown(text),
+                              content_key, assets().base_url)
+
+    def set_live(self, notes_cues, live):
+        edit = getattr(self, f"{notes_cues}_edit")
+        live_button = getattr(self, f"{notes_cues}_live_button")
+        live_preview = getattr(self, f"{notes_cues}_live_preview")
+        area_layout = getattr(self, f"{notes_cues}_area_layout")
+        current_mode = getattr(self, f"{notes_cues}_current_mode")
+
+        # bind and unbind switch modes without the button being clicked
+        live_button.blockSignals(True)
+        live_button.setChecked(live)
+        live_button.blockSignals(False)
+
+        if live == (current_mode == "live"):
+            return
+
+        if live:
+            # the editor stays visible, so leave the rendered mode first
+            if current_mode == "browser":
+                self.replace_widget(
+                    notes_cues, "browser", getattr(self.block, notes_cues))
+
+            text = edit.toPlainText()
+            preview = self.acquire_browser(render_key(text))
+            area_layout.addWidget(preview)
+            preview.show()
+            setattr(self, f"{notes_cues}_preview", preview)
+            setattr(self, f"{notes_cues}_current_mode", "live")
+            live_preview.schedule(text)
+        else:
+            live_preview.stop()
+            preview = getattr(self, f"{notes_cues}_preview")
+            area_layout.removeWidget(preview)
+            if self.browser_pool is not None:
+                self.release_browser(preview)
+            else:
+                preview.deleteLater()
+            setattr(self, f"{notes_cues}_preview", None)
+            setattr(self, f"{notes_cues}_current_mode", "edit")
+
+        getattr(self, f"{notes_cues}_render_edit_button").setEnabled(not live)
+        self.schedule_resize()
+
+    def update_preview(self, notes_cues):
+        if getattr(self, f"{notes_cues}_current_mode") == "live":
+            getattr(self, f"{notes_cues}_live_preview").schedule(
+                getattr(self, f"{notes_cues}_edit").toPlainText())
+
+    def show_preview(self, notes_cues, content_key, html):
+        preview = getattr(self, f"{notes_cues}_preview")
+        if preview is not None:
+            preview.show_html(
+                assets().page_head(), html, content_key, assets().base_url)
+
+    def reload_rendered(self):
+        # the page head changed on disk, pages showing the old one reload
+        for notes_cues in ("cues", "notes"):
+            current_mode = getattr(self, f"{notes_cues}_current_mode")
+            if current_mode == "browser":
+                browser = getattr(self, f"{notes_cues}_browser")
+                text = getattr(self.block, notes_cues)
+                browser.content_key = None
+                self.show_rendered(browser, render_key(text), text)
+            elif current_mode == "live":
+                getattr(self, f"{notes_cues}_preview").content_key = None
+                self.update_preview(notes_cues)
 
     def replace_widget(self, notes_cues, current_mode, text):
         if notes_cues == "cues":
             if current_mode == "edit":
+                content_key = render_key(text)
+                if self.cues_browser is None:
+                    self.cues_browser = self.acquire_browser(content_key)
                 from_widget = self.cues_edit
                 to_widget = self.cues_browser
-                to_widget.setHtml(self.markdown_to_html(
-                    text), baseUrl=self.baseurl)
+                self.show_rendered(to_widget, content_key, text)
                 self.cues_current_mode = "browser"
                 self.cues_current_widget = self.cues_browser
                 self.cues_render_edit_button.setText("Edit")
@@ -235,10 +1219,12 @@ class BlockNotesCuesWidget(QWidget):
                 self.cues_render_edit_button.setText("Render")
         if notes_cues == "notes":
             if current_mode == "edit":
+                content_key = render_key(text)
+                if self.notes_browser is None:
+                    self.notes_browser = self.acquire_browser(content_key)
                 from_widget = self.notes_edit
                 to_widget = self.notes_browser
-                to_widget.setHtml(self.markdown_to_html(
-                    text), baseUrl=self.baseurl)
+                self.show_rendered(to_widget, content_key, text)
                 self.notes_current_mode = "browser"
                 self.notes_current_widget = self.notes_browser
                 self.notes_render_edit_button.setText("Edit")
@@ -256,31 +1242,41 @@ class BlockNotesCuesWidget(QWidget):
         from_widget.hide()
         to_widget.show()
 
+        # hand the browser back so other cells can reuse it
+        if self.browser_pool is not None and current_mode == "browser":
+            self.release_browser(from_widget)
+            if notes_cues == "cues":
+                self.cues_browser = None
+            else:
+                self.notes_browser = None
+
 
 class BlockTitleWidget(QWidget):
+
+    # icons of the insert, remove and highlight buttons
+    icon_names = ('add_icon.png', 'remove_icon.png', 'highlight_icon.png')
+
     def __init__(self, parent=None):
         super(BlockTitleWidget, self).__init__(parent)
 
         # set fixed width
         self.setFixedWidth(140)
-        self.setStyleSheet("""padding: 1px""")
 
         # Create QLineEdit
         self.block_title_lineedit = QLineEdit()
 
         # Create QPushButtons
-        insert_icon = QIcon('icons/add_icon.png')
-        self.insert_button = QPushButton(icon=insert_icon)
+        self.insert_button = QPushButton()
         self.insert_button.setFixedSize(30, 30)
 
-        remove_icon = QIcon('icons/remove_icon.png')
-        self.remove_button = QPushButton(icon=remove_icon)
+        self.remove_button = QPushButton()
         self.remove_button.setFixedSize(30, 30)
 
-        highlight_icon = QIcon('icons/highlight_icon.png')
-        self.highlight_button = QPushButton(icon=highlight_icon)
+        self.highlight_button = QPushButton()
         self.highlight_button.setFixedSize(30, 30)
 
+        self.set_icons()
+
         # Create QVBoxLayout
         block_title_layout = QVBoxLayout()
         title_layout = QVBoxLayout()
@@ -301,6 +1297,13 @@ class BlockTitleWidget(QWidget):
         # Set the layout on the application's window
         self.setLayout(block_title_layout)
 
+    def set_icons(self):
+        # every title shares the icons of the asset registry
+        buttons = (self.insert_button, self.remove_button,
+                   self.highlight_button)
+        for button, icon_name in zip(buttons, self.icon_names):
+            button.setIcon(assets().icon(icon_name))
+
     def dropEvent(self, event):
         # Get the source item
         source_item = self.itemAt(event.source().pos())
@@ -321,17 +1324,82 @@ class BlockTitleWidget(QWidget):
             super(BlockTitleWidget, self).dropEvent(event)
 
 
+class FirstPaintProbe(QObject):
+    def __init__(self, started, parent=None):
+        super(FirstPaintProbe, self).__init__(parent)
+
+        # time.time() when the process was launched
+        self.started = started
+
+    def eventFilter(self, watched, event):
+        # report the first paint of the window, then quit
+        if event.type() == QEvent.Paint:
+            watched.removeEventFilter(self)
+            print(f"first paint {time.time() - self.started:.3f} s", flush=True)
+            QTimer.singleShot(0, QApplication.instance().quit)
+        return False
+
+
 class MyApp(QWidget):
+
+    # idle time in milliseconds before pending edits are written to disk
+    autosave_idle_ms = 1000
+
+    # rendered cells borrow their browsers from one shared pool
+    shared_renderer = True
+
+    # ".journal" creates notebooks that append edits instead of rewriting
+    notebook_extension = ".json"
+
+    # sections at this hierarchy level and deeper open collapsed, None
+    # opens every section expanded
+    collapse_on_open = 0
+
     def __init__(self):
         super().__init__()
 
         self.blocks = []
+        self.full_path = None
+
+        # blocks whose rows are hidden in both lists
+        self.hidden_blocks = set()
+
+        self.save_scheduler = SaveScheduler(
+            self.snapshot_blocks, idle_ms=self.autosave_idle_ms, parent=self)
+        self.save_scheduler.failed.connect(self.save_failed)
+
+        self.browser_pool = None
+        if self.shared_renderer:
+            self.browser_pool = BrowserPool(parent=self)
+
+        self.export_task = ExportTask(parent=self)
+        self.export_task.progress.connect(self.export_progress)
+        self.export_task.finished.connect(self.export_finished)
+        self.export_task.failed.connect(self.export_failed)
+        self.export_progress_dialog = None
+
+        # the open notebook is searched through its blocks, the other
+        # notebooks in its folder through the indexes saved beside them
+        self.search_index = BlockIndex()
+        self.folder_index = None
+        self.search_task = SearchTask(parent=self)
+        self.search_task.built.connect(self.search_index_built)
+        self.search_task.found.connect(self.folder_hits_found)
+
+        # numbers the searches, hits arriving for an older one are dropped
+        self.search_request = 0
 
         self.init_ui()
 
+        # the same window is initialised again when a notebook is opened
+        try:
+            assets().changed.connect(self.reload_asset, Qt.UniqueConnection)
+        except TypeError:
+            pass
+
     def init_ui(self):
         self.setWindowTitle('Cornell in Markdown')
-        self.setWindowIcon(QIcon("icons/app_icon.png"))
+        self.setWindowIcon(assets().icon('app_icon.png'))
         self.setGeometry(100, 100, 800, 600)
 
         self.layout = QGridLayout()
@@ -346,9 +1414,22 @@ class MyApp(QWidget):
         open_file_button = QPushButton("Open File")
         open_file_button.clicked.connect(self.open_file)
 
-        export_button = QPushButton("Export File")
+        # clicking exports, the arrow opens the export options
+        export_button = QToolButton()
+        export_button.setText("Export File")
+        export_button.setPopupMode(QToolButton.MenuButtonPopup)
+        export_button.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Preferred)
         export_button.clicked.connect(self.export_file)
 
+        export_menu = QMenu(export_button)
+        self.export_separator_action = export_menu.addAction("Separate Blocks")
+        self.export_titles_action = export_menu.addAction("Titles as Headings")
+        self.export_highlighted_action = export_menu.addAction(
+            "Highlighted Blocks Only")
+        for action in export_menu.actions():
+            action.setCheckable(True)
+        export_button.setMenu(export_menu)
+
         toolbar_layout = QGridLayout()
         toolbar_layout.addWidget(
             self.file_name_edit, 0, 0)
@@ -359,6 +1440,27 @@ class MyApp(QWidget):
         toolbar_layout.addWidget(
             export_button, 0, 3)        
 
+        # search
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("Search")
+        self.search_edit.setClearButtonEnabled(True)
+
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(200)
+        self.search_timer.timeout.connect(self.search)
+        self.search_edit.textChanged.connect(self.search_timer.start)
+        self.search_edit.returnPressed.connect(self.search)
+
+        toolbar_layout.addWidget(
+            self.search_edit, 0, 4)
+
+        self.search_results_list = QListWidget()
+        self.search_results_list.setMaximumHeight(150)
+        self.search_results_list.hide()
+        self.search_results_list.itemActivated.connect(self.jump_to_hit)
+        self.search_results_list.itemClicked.connect(self.jump_to_hit)
+
         # outlines visibility
         self.toggle_outlines_checkbox = QRadioButton("Show Outlines")
         self.toggle_outlines_checkbox.setChecked(True)
@@ -366,17 +1468,24 @@ class MyApp(QWidget):
             self.toggle_outlines)
 
         # Notes and Cues
-        self.notes_cues_list_widget = ListWidget()
+        # only the visible rows get a live BlockNotesCuesWidget
+        self.blocks_model = BlocksModel(self.blocks, self)
+        self.notes_cues_list_widget = NotebookView(
+            self.create_block_notes_cues_widget)
+        self.notes_cues_list_widget.setModel(self.blocks_model)
         self.notes_cues_list_widget.setFlow(QListView.TopToBottom)
         self.notes_cues_list_widget.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Preferred)
 
-        # Outlines list widget
-        self.outlines_list_widget = ListWidget()
-        self.outlines_list_widget.setFixedWidth(180)
+        # Outlines, painted from the same model and indented by hierarchy
+        self.outlines_list_widget = OutlineView()
+        self.outlines_list_widget.setModel(self.blocks_model)
+        self.outlines_list_widget.setFixedWidth(220)
 
         # set actions for the outlines
         self.outlines_list_widget.setDragDropMode(
             QAbstractItemView.InternalMove)
+        self.outlines_list_widget.setSelectionMode(
+            QAbstractItemView.ContiguousSelection)
         self.outlines_list_widget.setFlow(QListView.TopToBottom)
         self.outlines_list_widget.setWrapping(False)
         self.outlines_list_widget.setResizeMode(QListView.Fixed)
@@ -386,6 +1495,23 @@ class MyApp(QWidget):
 
         self.outlines_list_widget.dropEvent = self.handle_item_dropped
 
+        self.outlines_list_widget.titleEdited.connect(self.update_block_title)
+        self.outlines_list_widget.insertClicked.connect(self.insert_block_after)
+        self.outlines_list_widget.sectionToggled.connect(self.toggle_section)
+
+        # Ctrl+] and Ctrl+[ move the current block a level deeper or up
+        indent_shortcut = QShortcut(
+            QKeySequence("Ctrl+]"), self.outlines_list_widget)
+        indent_shortcut.activated.connect(lambda: self.change_hierarchy(1))
+        outdent_shortcut = QShortcut(
+            QKeySequence("Ctrl+["), self.outlines_list_widget)
+        outdent_shortcut.activated.connect(lambda: self.change_hierarchy(-1))
+        self.outlines_list_widget.removeClicked.connect(
+            lambda block: self.remove_block(self.blocks_model.row_of(block)))
+        self.outlines_list_widget.highlightClicked.connect(
+            lambda block: self.highlight_block(
+                self.blocks_model.row_of(block), change_highlight_status=True))
+
         # set sync selection
         self.outlines_list_widget.currentRowChanged.connect(
             self.sync_list_item_selection)
@@ -400,169 +1526,146 @@ class MyApp(QWidget):
             self.notes_cues_list_widget, 1, 0)
         self.layout.addWidget(
             self.outlines_list_widget, 1, 1)
+        self.layout.addWidget(
+            self.search_results_list, 2, 0, 1, 2)
         
         # set layout for the whole widget
         self.setLayout(self.layout)
         self.show()
 
-    def insert_block_notes_cues(self, index, new_block):
-        # initialize a block_notes_cues_widget
-        block_notes_cues_widget = BlockNotesCuesWidget()
-        # edit
-        # cues_edit
-        cues_edit = block_notes_cues_widget.cues_edit
-        cues_edit.setPlainText(new_block.cues)
+    def create_block_notes_cues_widget(self):
+        # initialize a block_notes_cues_widget, the notes list binds it
+        # to whichever block scrolls into view
+        block_notes_cues_widget = BlockNotesCuesWidget(
+            browser_pool=self.browser_pool)
 
-        # notes_edit
+        cues_edit = block_notes_cues_widget.cues_edit
         notes_edit = block_notes_cues_widget.notes_edit
-        notes_edit.setPlainText(new_block.notes)
-
-        block_notes_cues_widget.auto_resize()
-
-        # browser
-        # notes_browser
-        notes_browser = block_notes_cues_widget.notes_browser
-        notes_browser.setHtml(
-            BlockNotesCuesWidget.markdown_to_html(
-                block_notes_cues_widget, new_block.notes),
-            baseUrl=block_notes_cues_widget.baseurl)
-        # cues_browser
-        cues_browser = block_notes_cues_widget.cues_browser
-        cues_browser.setHtml(
-            BlockNotesCuesWidget.markdown_to_html(
-                block_notes_cues_widget, new_block.cues),
-            baseUrl=block_notes_cues_widget.baseurl)
-
-        # insert item to the listwidget
-        item = QListWidgetItem()
-        item.setSizeHint(block_notes_cues_widget.sizeHint())
-
-        self.notes_cues_list_widget.insertItem(index, item)
-        self.notes_cues_list_widget.setItemWidget(
-            item, block_notes_cues_widget)
 
         # connect
         # cues_edit connect
         cues_edit.textChanged.connect(
-            lambda: self.update_block_cues(new_block, cues_edit.toPlainText()))
-        cues_edit.textChanged.connect(
-            lambda i=item, w=block_notes_cues_widget: self.set_size_hint(i, w))
+            lambda w=block_notes_cues_widget: self.update_block_cues(
+                w.block, w.cues_edit.toPlainText()))
 
         # notes_edit connect
         notes_edit.textChanged.connect(
-            lambda: self.update_block_notes(new_block, notes_edit.toPlainText()))
-        notes_edit.textChanged.connect(
-            lambda i=item, w=block_notes_cues_widget: self.set_size_hint(i, w))
+            lambda w=block_notes_cues_widget: self.update_block_notes(
+                w.block, w.notes_edit.toPlainText()))
+
+        # the row follows the widget once it has resized
+        block_notes_cues_widget.resized.connect(
+            lambda w=block_notes_cues_widget: self.set_size_hint(w))
 
         # connect edit/render button
         block_notes_cues_widget.cues_render_edit_button.clicked.connect(
-            lambda checked, i=item, w=block_notes_cues_widget:
+            lambda checked, w=block_notes_cues_widget:
             (
                 w.replace_widget(
-                    notes_cues="cues", current_mode=w.cues_current_mode, text=new_block.cues),
-                w.auto_resize(),
-                self.set_size_hint(i, w)
+                    notes_cues="cues", current_mode=w.cues_current_mode, text=w.block.cues),
+                w.schedule_resize()
             )
         )
         block_notes_cues_widget.notes_render_edit_button.clicked.connect(
-            lambda checked, i=item, w=block_notes_cues_widget:
+            lambda checked, w=block_notes_cues_widget:
             (
                 w.replace_widget(
-                    notes_cues="notes", current_mode=w.notes_current_mode, text=new_block.notes),
-                w.auto_resize(),
-                self.set_size_hint(i, w)
+                    notes_cues="notes", current_mode=w.notes_current_mode, text=w.block.notes),
+                w.schedule_resize()
             )
         )
 
-    def set_size_hint(self, item, widget):
-        item.setSizeHint(
-            QSize(widget.width(), widget.height() + 10))
-
-    def insert_block_title(self, index, new_block):
-        # title_block
-        # initial item
-        block_title_widget = BlockTitleWidget()
-
-        # insert item to the listwidget
-        item = QListWidgetItem()
-
-        self.outlines_list_widget.insertItem(index, item)
-        self.outlines_list_widget.setItemWidget(item, block_title_widget)
-
-        # set initial sizehint for the item
-        # item.setSizeHint(block_title_widget.sizeHint())
-        item.setSizeHint(QSize(130, 90))
-
-        # set block_title_widget actions
-        # title_edit
-        title_edit = block_title_widget.block_title_lineedit
-        title_edit.textChanged.connect(
-            lambda text=title_edit, b=new_block: self.update_block_title(b, text))
-        title_edit.setText(new_block.title)
-
-        # insert_button
-        insert_button = block_title_widget.insert_button
-        insert_button.clicked.connect(
-            lambda checked, b=new_block: self.insert_block(
-                self.blocks.index(b) + 1, Block())
-        )
+        return block_notes_cues_widget
 
-        # remove_button
-        remove_button = block_title_widget.remove_button
-        remove_button.clicked.connect(
-            lambda checked, b=new_block: self.remove_block(self.blocks.index(b)))
+    def insert_block_notes_cues(self, index, new_block):
+        # the widget itself is only created once the row becomes visible
+        self.blocks_model.insert_block(index, new_block)
 
-        # highlight_button
-        highlight_button = block_title_widget.highlight_button
-        highlight_button.clicked.connect(
-            lambda checked, b=new_block: self.highlight_block(
-                self.blocks.index(b), change_highlight_status=True)
-        )
+    def set_size_hint(self, widget):
+        self.notes_cues_list_widget.update_row_height(widget)
 
-        block_title_widget.show()
+    def insert_block(self, index, new_block=None):
 
-    def insert_block(self, index, new_block=Block()):
+        if new_block is None:
+            new_block = Block()
 
-        self.blocks.insert(index, new_block)
         self.insert_block_notes_cues(index, new_block)
-        self.insert_block_title(index, new_block)
-        self.update_blocks()
-
-        if new_block.highlighted == 1:
-            self.highlight_block(index, change_highlight_status=False)
+        self.search_index.mark_changed(new_block)
+        self.update_hidden_rows()
+        self.update_blocks(
+            {'op': 'insert', 'row': index, 'block': new_block.to_dict()})
+
+    def insert_block_after(self, block):
+        # the first child of an expanded section, the next sibling of a
+        # collapsed one or of a block without children
+        row = self.blocks_model.row_of(block)
+        if not self.blocks_model.has_children(row):
+            self.insert_block(row + 1, Block(hierarchy=block.hierarchy))
+        elif self.blocks_model.state(block).collapsed:
+            self.insert_block(self.blocks_model.section_end(row),
+                              Block(hierarchy=block.hierarchy))
+        else:
+            self.insert_block(row + 1, Block(hierarchy=block.hierarchy + 1))
 
     def remove_block(self, index):
 
         if len(self.blocks) > 1:
 
-            # remove from notes
-            block_note_cues_item = self.notes_cues_list_widget.takeItem(
-                index)
-            if block_note_cues_item is not None:
-                del block_note_cues_item
+            self.search_index.mark_removed(self.blocks[index])
 
-            # remove from the outlines
-            block_title_item = self.outlines_list_widget.takeItem(index)
-            if block_title_item is not None:
-                del block_title_item
+            # removes it from the notes and the outlines
+            self.blocks_model.remove_block(index)
+            self.update_hidden_rows()
 
-            self.blocks.pop(index)
-
-            self.update_blocks()
+            self.update_blocks({'op': 'remove', 'row': index})
 
     def handle_item_dropped(self, event):
-        # Get the source widget
-        source_widget = event.source()
-        # Get the original index of the dragged item
-        original_index = source_widget.currentRow()
-        # Get the drop index
+        # Get the dragged rows, the selection is always one contiguous range
+        rows = sorted(index.row()
+                      for index in self.outlines_list_widget.selectedIndexes())
+        if not rows:
+            rows = [self.outlines_list_widget.currentRow()]
+        # hidden rows between them come along, and a collapsed section
+        # moves as a whole
+        end = rows[-1] + 1
+        if self.blocks_model.state(self.blocks[rows[-1]]).collapsed:
+            end = self.blocks_model.section_end(rows[-1])
+        count = end - rows[0]
+        # Get the drop index, below the last item means the end
         drop_index = self.outlines_list_widget.indexAt(event.pos()).row()
-
-        # move the blocks
-        block = self.blocks[original_index]
-        # remove at original place
-        self.remove_block(original_index)
-        self.insert_block(drop_index, block)
+        if drop_index == -1:
+            drop_index = len(self.blocks) - count
+        elif drop_index > rows[0]:
+            # moving down, the moved rows end right after the row dropped on,
+            # or after its whole section when it is collapsed, a dragged
+            # section counts all of its hidden rows
+            target_end = drop_index + 1
+            if self.blocks_model.state(self.blocks[drop_index]).collapsed:
+                target_end = self.blocks_model.section_end(drop_index)
+            drop_index = target_end - count
+
+        # the rows are moved here, keep Qt from removing the dragged items
+        event.setDropAction(Qt.IgnoreAction)
+        event.accept()
+
+        self.move_blocks(rows[0], count, drop_index)
+
+    def move_blocks(self, row, count, position):
+        # position is where the first moved block ends up
+        position = min(max(position, 0), len(self.blocks) - count)
+        if position == row:
+            return
+
+        # destination before the move, as Qt expects it
+        destination = position if position < row else position + count
+
+        # widgets and render/edit state travel with their rows
+        self.blocks_model.move_blocks(row, count, destination)
+        self.update_hidden_rows()
+
+        self.outlines_list_widget.setCurrentRow(position)
+        self.update_blocks({'op': 'move', 'row': row, 'count': count,
+                            'destination': destination})
 
     def highlight_block(self, index, change_highlight_status):
         # Find the index of the block
@@ -570,17 +1673,58 @@ class MyApp(QWidget):
 
         if change_highlight_status == True:
             block.highlighted = abs(block.highlighted - 1)
-            self.update_blocks()
-
-        notes_cues_item = self.notes_cues_list_widget.item(index)
-        title_item = self.outlines_list_widget.item(index)
-
-        if block.highlighted == 1:
-            notes_cues_item.setBackground(QColor(223, 199, 75, 76))
-            title_item.setBackground(QColor(223, 199, 75, 76))
-        else:
-            notes_cues_item.setBackground(QColor(255, 255, 255, 75))
-            title_item.setBackground(QColor(255, 255, 255, 75))
+            self.update_blocks(
+                self.set_op(block, 'highlighted', block.highlighted, index))
+
+        # both lists take their background from the model
+        self.blocks_model.block_changed(index)
+
+    def update_hidden_rows(self):
+        # hide the rows of collapsed sections, only the ones that changed
+        hidden = self.blocks_model.hidden_blocks()
+        for block in hidden ^ self.hidden_blocks:
+            if self.blocks_model.state(block) is None:
+                continue
+            row = self.blocks_model.row_of(block)
+            self.notes_cues_list_widget.setRowHidden(row, block in hidden)
+            self.outlines_list_widget.setRowHidden(row, block in hidden)
+        self.hidden_blocks = hidden
+
+    def toggle_section(self, block):
+        state = self.blocks_model.state(block)
+        state.collapsed = not state.collapsed
+        self.blocks_model.block_changed(self.blocks_model.row_of(block))
+        self.update_hidden_rows()
+
+    def reveal_row(self, row):
+        # expand the sections hiding row
+        for parent in self.blocks_model.section_rows(row):
+            self.blocks_model.state(self.blocks[parent]).collapsed = False
+        self.update_hidden_rows()
+
+    def change_hierarchy(self, delta):
+        row = self.outlines_list_widget.currentRow()
+        if row < 0:
+            return
+        block = self.blocks[row]
+
+        # at most one level deeper than the block above
+        hierarchy = max(block.hierarchy + delta, 0)
+        if delta > 0:
+            hierarchy = min(
+                hierarchy, self.blocks[row - 1].hierarchy + 1 if row else 0)
+        if hierarchy == block.hierarchy:
+            return
+
+        block.hierarchy = hierarchy
+        self.update_blocks(self.set_op(block, 'hierarchy', hierarchy, row))
+
+        # the block above may have gained or lost its children
+        self.blocks_model.block_changed(row)
+        if row:
+            self.blocks_model.block_changed(row - 1)
+        self.update_hidden_rows()
+        self.outlines_list_widget.sync_title_widget()
 
     def sync_list_item_selection(self, index):
 
@@ -591,24 +1735,73 @@ class MyApp(QWidget):
 
     def update_block_title(self, block, new_title):
         block.title = new_title
-        self.update_blocks()
+        self.search_index.mark_changed(block)
+        self.update_blocks(self.set_op(block, 'title', new_title))
 
     def update_block_cues(self, block, cues_text):
         block.cues = cues_text
-        self.update_blocks()
+        self.search_index.mark_changed(block)
+        self.update_blocks(self.set_op(block, 'cues', cues_text))
 
     def update_block_notes(self, block, notes_text):
         block.notes = notes_text
-        self.update_blocks()
+        self.search_index.mark_changed(block)
+        self.update_blocks(self.set_op(block, 'notes', notes_text))
 
     def update_block_highlight(self, block, highlighted):
         block.highlighted = highlighted
-        self.update_blocks()
-
-    def update_blocks(self):
-        blocks_data = [block.to_dict() for block in self.blocks]
-        with open(self.full_path, 'w') as file:
-            json.dump(blocks_data, file, indent=2)
+        self.update_blocks(self.set_op(block, 'highlighted', highlighted))
+
+    def set_op(self, block, field, value, row=None):
+        if row is None:
+            row = self.blocks_model.row_of(block)
+        return {'op': 'set', 'row': row, 'field': field, 'value': value}
+
+    def update_blocks(self, op=None):
+        # op describes the edit for journaled notebooks
+        self.save_scheduler.mark_dirty(op)
+
+    def set_full_path(self, full_path):
+        self.full_path = full_path
+        self.save_scheduler.set_store(open_store(full_path))
+        self.search_index.reset(self.blocks, full_path)
+        self.folder_index = FolderIndex(
+            os.path.dirname(os.path.abspath(full_path)))
+
+    def snapshot_blocks(self):
+        return self.blocks
+
+    @pyqtSlot(str)
+    def reload_asset(self, name):
+        if name == 'AppStyling.css':
+            QApplication.instance().setStyleSheet(assets().text(name))
+        elif name in ('head.html', 'css_style.css'):
+            # spare browsers and snapshots still show the old page head
+            if self.browser_pool is not None:
+                for browser in self.browser_pool.spare_browsers:
+                    browser.content_key = None
+            self.notes_cues_list_widget.snapshots.clear()
+            for widget in self.notes_cues_list_widget.live_widgets.values():
+                widget.reload_rendered()
+        elif name.startswith('icons'):
+            self.setWindowIcon(assets().icon('app_icon.png'))
+            self.outlines_list_widget.title_widget.set_icons()
+            self.outlines_list_widget.viewport().update()
+
+    def closeEvent(self, event):
+        # write out any pending edits before the window goes away
+        error = self.save_scheduler.close()
+        self.export_task.close()
+        self.search_task.close()
+        if error is not None:
+            self.save_failed(str(error))
+
+        # the notebook is on disk now, so the index saved beside it matches
+        try:
+            self.search_index.save()
+        except OSError as error:
+            print(f"Error saving search index: {self.full_path}\nError: {str(error)}")
+        super(MyApp, self).closeEvent(event)
 
     def open_folder_dialog(self):
         options = QFileDialog.Options()
@@ -638,24 +1831,25 @@ class MyApp(QWidget):
             self.file_name_edit.setText(filename)
             self.file_name_edit.setReadOnly(True)
 
-            # Append ".json" to the filename to create the full filename with extension
-            full_path = os.path.join(folder_path, f"{filename}.json")
+            # Append the extension to the filename to create the full filename
+            full_path = os.path.join(
+                folder_path, f"{filename}{self.notebook_extension}")
             # Perform the file-saving operation (e.g., create an empty JSON file)
             if os.path.exists(full_path):
                 QMessageBox.warning(
                     self, "File Exists", f"A file with the name '{filename}' already exists.")
             else:
-                with open(full_path, 'w') as file:
-                    json.dump({}, file)
-
-                self.full_path = full_path
+                self.set_full_path(full_path)
+                self.save_scheduler.store.create()
                 self.insert_block(0)
 
     def open_file(self):
         options = QFileDialog.Options()
 
         file_path, _ = QFileDialog.getOpenFileName(
-            self, "Open JSON File", "", "JSON Files (*.json);;All Files (*)", options=options)
+            self, "Open JSON File", "",
+            "Notebooks (*.json *.journal);;JSON Files (*.json);;All Files (*)",
+            options=options)
 
         if file_path:
 
@@ -664,7 +1858,6 @@ class MyApp(QWidget):
 
             file_name, _ = os.path.splitext(os.path.basename(file_path))
 
-            self.full_path = file_path
             self.file_name_edit.setText(file_name)
             self.file_name_edit.setReadOnly(True)
 
@@ -673,51 +1866,187 @@ class MyApp(QWidget):
 
     def process_json_file(self, file_path):
         try:
-            with open(file_path, 'r') as file:
-                notebook = json.load(file)
+            self.set_full_path(file_path)
+            notebook = self.save_scheduler.store.load()
 
-                self.blocks.clear()
-                if notebook is None:
-                    notebook.insert(Block().to_dict())
+            self.load_blocks([Block.from_dict(data) for data in notebook])
 
-                for i in range(len(notebook)):
-                    new_block = Block.from_dict(notebook[i])
-                    self.insert_block(i, new_block)
+            # a freshly created file holds no blocks
+            if not notebook:
+                self.insert_block(0)
 
         except Exception as e:
             print(f"Error loading JSON file: {file_path}\nError: {str(e)}")
 
-    def export_file(self):
+    def load_blocks(self, blocks):
+        # populate both lists in one pass without saving or relayouting
+        # after every block, the file on disk already holds these blocks
+        self.save_scheduler.suspend()
+        self.notes_cues_list_widget.setUpdatesEnabled(False)
+        self.outlines_list_widget.setUpdatesEnabled(False)
 
-        file_name = self.file_name_edit.text()
+        try:
+            self.blocks_model.reset_blocks(blocks)
+            self.search_index.reset(self.blocks, self.full_path)
+
+            # resetting the model shows every row again
+            self.hidden_blocks = set()
+            if self.collapse_on_open is not None:
+                self.blocks_model.collapse_to(self.collapse_on_open)
+            self.update_hidden_rows()
+        finally:
+            self.notes_cues_list_widget.setUpdatesEnabled(True)
+            self.outlines_list_widget.setUpdatesEnabled(True)
+            self.save_scheduler.resume()
+
+    def search(self):
+        self.search_timer.stop()
+        self.search_results_list.clear()
+        self.search_request += 1
+
+        query = self.search_edit.text()
+        if not query.strip():
+            self.search_results_list.hide()
+            return
+
+        # the first search indexes the open notebook on the worker, its
+        # hits are listed once that is done
+        if self.search_index.built:
+            for block_id, score in self.search_index.search(query, limit=50):
+                row = self.blocks_model.row_of_id(block_id)
+                item = QListWidgetItem(self.blocks[row].title or "Untitled")
+                # the block id, rows move with later edits
+                item.setData(Qt.UserRole, (None, block_id))
+                self.search_results_list.addItem(item)
+        else:
+            item = QListWidgetItem("Indexing notebook...")
+            item.setFlags(Qt.NoItemFlags)
+            self.search_results_list.addItem(item)
+            self.search_task.build(self.search_index)
+
+        # the other notebooks are added when the worker has searched them
+        if self.folder_index is not None:
+            self.search_task.search_folder(
+                self.search_request, self.folder_index, query,
+                {os.path.abspath(self.full_path)})
+
+        self.search_results_list.setVisible(
+            self.search_results_list.count() > 0)
+
+    def search_index_built(self, block_index, generation, index, rebuilt):
+        self.search_task.building = None
+        if (block_index is not self.search_index or
+                generation != block_index.generation):
+            return
+        if index is None:
+            # the worker failed, build it here instead
+            block_index.build()
+        else:
+            block_index.install(index, rebuilt)
+        if self.search_edit.text().strip():
+            self.search()
+
+    def folder_hits_found(self, request, hits):
+        if request != self.search_request:
+            return
+        for path, row, title, score in hits:
+            name, _ = os.path.splitext(os.path.basename(path))
+            item = QListWidgetItem(f"{title or 'Untitled'} ({name})")
+            item.setData(Qt.UserRole, (path, row))
+            self.search_results_list.addItem(item)
+        self.search_results_list.setVisible(
+            self.search_results_list.count() > 0)
+
+    def jump_to_hit(self, item):
+        if item.data(Qt.UserRole) is None:
+            return
+        path, row = item.data(Qt.UserRole)
+
+        if path is None:
+            # a block of the open notebook, skipped once it was removed
+            try:
+                row = self.blocks_model.row_of_id(row)
+            except KeyError:
+                return
+        else:
+            # the hit is in another notebook of the folder, open it first
+            query = self.search_edit.text()
 
-        notes = ""
-        cues = ""
+            self.close()
+            self.__init__()
 
-        for block in self.blocks:
-            notes = notes + block.notes
-            cues = cues + block.cues
+            file_name, _ = os.path.splitext(os.path.basename(path))
+            self.file_name_edit.setText(file_name)
+            self.file_name_edit.setReadOnly(True)
+            self.process_json_file(path)
 
-        try:
-            with open(f"{file_name}_notes.md", 'w') as notes_file:
-                notes_file.write(notes)
-            notes_file.close()
-
-            with open(f"{file_name}_cues.md", 'w') as cues_file:
-                cues_file.write(cues)
-            cues_file.close()
-
-            file_exported_message_box = QMessageBox()
-            file_exported_message_box.setWindowTitle("File Exported")
-            file_exported_message_box.setText(
-                f"{file_name}_notes.md and {file_name}_cues.md files are successfully exported.")
-            file_exported_message_box.setObjectName(
-                "file_exported_message_box")
-            file_exported_message_box.exec_()
-
-        except:
-            QMessageBox.warning(self, "File Export Error",
-                                "The Markdown files can not be exported.")
+            self.search_edit.blockSignals(True)
+            self.search_edit.setText(query)
+            self.search_edit.blockSignals(False)
+
+        if 0 <= row < len(self.blocks):
+            self.reveal_row(row)
+            self.notes_cues_list_widget.setCurrentRow(row)
+            self.notes_cues_list_widget.scrollTo(
+                self.blocks_model.index(row, 0), QAbstractItemView.PositionAtTop)
+
+    def export_file(self):
+
+        if self.export_task.running():
+            return
+
+        file_name = self.file_name_edit.text()
+
+        # next to the notebook instead of the working directory
+        folder_path = os.getcwd()
+        if self.full_path is not None:
+            folder_path = os.path.dirname(os.path.abspath(self.full_path))
+
+        options = ExportOptions(
+            separator=BLOCK_SEPARATOR if self.export_separator_action.isChecked() else '',
+            titles_as_headings=self.export_titles_action.isChecked(),
+            highlighted_only=self.export_highlighted_action.isChecked())
+
+        # the worker reads a copy, so editing can go on during the export
+        notebook = Notebook.from_blocks(self.blocks)
+
+        self.export_progress_dialog = QProgressDialog(
+            "Exporting Markdown files...", None, 0, len(notebook), self)
+        self.export_progress_dialog.setWindowTitle("Export File")
+        self.export_progress_dialog.setMinimumDuration(500)
+        self.export_progress_dialog.setValue(0)
+
+        self.export_task.start(
+            notebook, os.path.join(folder_path, file_name), options)
+
+    def export_progress(self, row, total):
+        if self.export_progress_dialog is not None:
+            self.export_progress_dialog.setValue(row)
+
+    def close_export_progress(self):
+        if self.export_progress_dialog is not None:
+            self.export_progress_dialog.close()
+            self.export_progress_dialog = None
+
+    def export_finished(self, notes_path, cues_path):
+        self.close_export_progress()
+
+        file_exported_message_box = QMessageBox()
+        file_exported_message_box.setWindowTitle("File Exported")
+        file_exported_message_box.setText(
+            f"{notes_path} and {cues_path} files are successfully exported.")
+        file_exported_message_box.setObjectName(
+            "file_exported_message_box")
+        file_exported_message_box.exec_()
+
+    def save_failed(self, error):
+        QMessageBox.warning(self, "File Save Error",
+                            f"The notebook can not be saved.\n{error}")
+
+    def export_failed(self, error):
+        self.close_export_progress()
+        QMessageBox.warning(self, "File Export Error",
+                            f"The Markdown files can not be exported.\n{error}")
 
     def toggle_outlines(self):
         
@@ -737,10 +2066,31 @@ class MyApp(QWidget):
 
 if __name__ == '__main__':
 
-    with open("AppStyling.css", "r") as f:
-        _style = f.read()
+    # lets QtWebEngine be imported after the application exists, it is
+    # only loaded once the first cell is rendered
+    QApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
 
     app = QApplication(sys.argv)
-    app.setStyleSheet(_style)
+    app.setStyleSheet(assets().text('AppStyling.css'))
+
+    # CORNELL_KEY_LATENCY=100 prints key press latency every 100 keys
+    if os.environ.get("CORNELL_KEY_LATENCY"):
+        MarkdownTextEdit.latency_recorder = KeyLatencyRecorder(
+            report_every=int(os.environ["CORNELL_KEY_LATENCY"]))
+
+    # rendered cells survive between sessions, CORNELL_RENDER_CACHE moves
+    # the cache directory
+    try:
+        open_disk_cache(os.environ.get("CORNELL_RENDER_CACHE"))
+    except OSError as error:
+        print(f"Error opening render cache: {error}")
+
     ex = MyApp()
+
+    # CORNELL_STARTUP_PROBE=<time.time() at launch> prints the time to the
+    # first paint and quits, see benchmarks/bench_startup.py
+    if os.environ.get("CORNELL_STARTUP_PROBE"):
+        ex.installEventFilter(FirstPaintProbe(
+            float(os.environ["CORNELL_STARTUP_PROBE"]), ex))
+
     sys.exit(app.exec_())
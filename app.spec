@@ -5,7 +5,13 @@ a = Analysis(
     ['app.py'],
     pathex=[],
     binaries=[],
-    datas=[],
+    # Assets.py reads these from the bundle directory of a frozen build
+    datas=[
+        ('head.html', '.'),
+        ('css_style.css', '.'),
+        ('AppStyling.css', '.'),
+        ('icons', 'icons'),
+    ],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
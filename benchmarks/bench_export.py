@@ -0,0 +1,63 @@
+# time the Markdown export: the old string concatenation against the
+# streaming exporter, on generated notebooks of growing size
+#
+#   python benchmarks/bench_export.py --sizes 1000 10000 50000
+#
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from MarkdownExport import export_markdown
+from Notebook import Notebook
+
+
+def make_notebook(size):
+    notebook = Notebook()
+    for i in range(size):
+        notebook.append(f"block {i}",
+                        f"# Notes {i}\n\nSome *notes* with `code`.\n" * 8,
+                        f"- cue {i}\n", 0, i % 2)
+    return notebook
+
+
+def concatenate(notebook, base_path):
+    # what export_file used to do
+    notes = ""
+    cues = ""
+    for block in notebook:
+        notes = notes + block.notes
+        cues = cues + block.cues
+    with open(f"{base_path}_notes.md", 'w') as notes_file:
+        notes_file.write(notes)
+    with open(f"{base_path}_cues.md", 'w') as cues_file:
+        cues_file.write(cues)
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[1000, 10000, 50000])
+    args = parser.parse_args()
+
+    print(f"{'blocks':>8} {'concat (s)':>11} {'stream (s)':>11}")
+    with tempfile.TemporaryDirectory() as directory:
+        base_path = os.path.join(directory, 'notebook')
+        for size in args.sizes:
+            notebook = make_notebook(size)
+            print(f"{size:>8} {timed(concatenate, notebook, base_path):>11.3f} "
+                  f"{timed(export_markdown, notebook, base_path):>11.3f}")
+
+
+if __name__ == '__main__':
+    main()
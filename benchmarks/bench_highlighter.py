@@ -0,0 +1,66 @@
+# cost of MarkdownHighlighter per 10k lines of markdown
+#
+#   python benchmarks/bench_highlighter.py --lines 10000
+#
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PyQt5.QtGui import QTextCursor, QTextDocument
+from PyQt5.QtWidgets import QApplication
+from MarkdownEditor import MarkdownHighlighter
+
+SAMPLE = [
+    "# Heading with `code`",
+    "Some *italic*, **bold** and ***both*** with ==highlight==.",
+    "A [link](https://example.com) and inline math $a^2 + b^2$.",
+    "```python",
+    "def f(x):",
+    "    return x * 2",
+    "```",
+    "$$",
+    "y = ax + b",
+    "$$",
+    "- a plain list item without any markup at all",
+]
+
+
+def make_text(lines):
+    return "\n".join(SAMPLE[i % len(SAMPLE)] for i in range(lines))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lines', type=int, default=10000)
+    parser.add_argument('--edits', type=int, default=200)
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+
+    document = QTextDocument()
+    document.setPlainText(make_text(args.lines))
+
+    start = time.perf_counter()
+    highlighter = MarkdownHighlighter(document)
+    highlighter.rehighlight()
+    full = time.perf_counter() - start
+
+    # typing in the middle of the document only rehighlights that line
+    cursor = QTextCursor(document.findBlockByNumber(args.lines // 2))
+    cursor.movePosition(QTextCursor.EndOfBlock)
+    start = time.perf_counter()
+    for _ in range(args.edits):
+        cursor.insertText("x")
+    edit = (time.perf_counter() - start) / args.edits
+
+    print(f"full highlight: {full * 1000:.1f} ms for {args.lines} lines "
+          f"({full * 1000 * 10000 / args.lines:.1f} ms per 10k lines)")
+    print(f"single keystroke: {edit * 1e6:.1f} us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+# bytes and time written per edit: whole-file JSON serialized from scratch,
+# whole-file JSON reusing the fragments of unchanged blocks, and the journal
+#
+#   python benchmarks/bench_journal.py --sizes 100 1000 10000
+#
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from NotebookStorage import JournalStore, JsonStore, write_notebook
+
+
+class BenchBlock:
+    # the parts of app.Block the stores rely on
+    def __init__(self, id, notes):
+        self.id = id
+        self.version = 0
+        self.notes = notes
+
+    def to_dict(self):
+        return {'title': f"block {self.id}", 'notes': self.notes,
+                'cues': f"- cue {self.id}", 'hierarchy': 0, 'highlighted': 0}
+
+
+def make_blocks(size):
+    return [BenchBlock(i, f"# Notes {i}\n\nSome *notes* with `code` and $x^{i}$.")
+            for i in range(size)]
+
+
+def measure(store, blocks, edits, from_scratch=False):
+    written = 0
+    start = time.perf_counter()
+    for edit in range(edits):
+        block = blocks[(edit * 7919) % len(blocks)]
+        block.notes += 'x'
+        block.version += 1
+        op = {'op': 'set', 'row': block.id, 'field': 'notes',
+              'value': block.notes}
+
+        before = os.path.getsize(store.path)
+        if from_scratch:
+            # what every save cost before fragments were cached
+            write_notebook(store.path, [b.to_dict() for b in blocks])
+            snapshot = True
+        else:
+            snapshot = None
+            if store.needs_snapshot():
+                snapshot = store.snapshot(blocks)
+            store.save(snapshot, [op])
+        after = os.path.getsize(store.path)
+        # a whole-file rewrite writes all of it
+        written += after if snapshot is not None else after - before
+    elapsed = time.perf_counter() - start
+    return written / edits, elapsed / edits
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[100, 1000, 10000])
+    parser.add_argument('--edits', type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"{'blocks':>8} {'json B/edit':>12} {'scratch ms':>11} "
+          f"{'cached ms':>10} {'journal B/edit':>15} {'journal ms':>11}")
+    with tempfile.TemporaryDirectory() as folder:
+        for size in args.sizes:
+            json_store = JsonStore(os.path.join(folder, f"{size}.json"))
+            blocks = make_blocks(size)
+            json_store.save(json_store.snapshot(blocks), [])
+            _, scratch_time = measure(
+                json_store, blocks, args.edits, from_scratch=True)
+            json_bytes, json_time = measure(json_store, blocks, args.edits)
+
+            journal_store = JournalStore(
+                os.path.join(folder, f"{size}.journal"))
+            blocks = make_blocks(size)
+            journal_store.compact([block.to_dict() for block in blocks])
+            journal_bytes, journal_time = measure(
+                journal_store, blocks, args.edits)
+
+            print(f"{size:>8} {json_bytes:>12.0f} {scratch_time * 1000:>11.2f} "
+                  f"{json_time * 1000:>10.2f} {journal_bytes:>15.0f} "
+                  f"{journal_time * 1000:>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+# time MyApp.process_json_file on generated notebooks of growing size
+#
+#   python benchmarks/bench_load.py --sizes 100 1000 5000
+#
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PyQt5.QtWidgets import QApplication
+import app
+import NotebookStorage
+
+
+def make_notebook(size):
+    return [
+        {
+            'title': f"block {i}",
+            'notes': f"# Notes {i}\n\nSome *notes* with `code` and $x^{i}$.",
+            'cues': f"- cue {i}",
+            'hierarchy': 0,
+            'highlighted': i % 2,
+        }
+        for i in range(size)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[100, 1000, 5000])
+    args = parser.parse_args()
+
+    qt_app = QApplication(sys.argv)
+
+    # count notebook writes issued while loading
+    writes = []
+    save = NotebookStorage.JsonStore.save
+    NotebookStorage.JsonStore.save = lambda store, blocks_data, ops: (
+        writes.append(store.path), save(store, blocks_data, ops))
+
+    print(f"{'blocks':>8} {'load (s)':>10} {'writes':>8}")
+    with tempfile.TemporaryDirectory() as folder:
+        for size in args.sizes:
+            path = os.path.join(folder, f"notebook_{size}.json")
+            with open(path, 'w') as file:
+                json.dump(make_notebook(size), file, indent=2)
+
+            window = app.MyApp()
+            writes.clear()
+
+            start = time.perf_counter()
+            window.process_json_file(path)
+            qt_app.processEvents()
+            elapsed = time.perf_counter() - start
+
+            window.close()
+            print(f"{size:>8} {elapsed:>10.3f} {len(writes):>8}")
+            window.deleteLater()
+            qt_app.processEvents()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+# memory per block: the old dict-backed Block, the slotted Block and the
+# columnar Notebook, measured with tracemalloc
+#
+#   python benchmarks/bench_memory.py --blocks 50000
+#
+import argparse
+import gc
+import itertools
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from Notebook import Block, Notebook
+
+
+class DictBlock:
+    # the Block from before it was slotted, attributes live in a __dict__
+    _ids = itertools.count()
+    fields = Block.fields
+
+    def __init__(self, title='', notes='', cues='', hierarchy=0, highlighted=0):
+        self.version = 0
+        self.id = next(DictBlock._ids)
+        self.title = title
+        self.notes = notes
+        self.cues = cues
+        self.hierarchy = hierarchy
+        self.highlighted = highlighted
+
+    def __setattr__(self, name, value):
+        if name in self.fields:
+            super(DictBlock, self).__setattr__('version', self.version + 1)
+        super(DictBlock, self).__setattr__(name, value)
+
+
+def make_blocks_data(size):
+    # short shared strings, so the containers themselves dominate
+    return [
+        {'title': 'title', 'notes': 'notes', 'cues': 'cues',
+         'hierarchy': i % 3, 'highlighted': i % 2}
+        for i in range(size)
+    ]
+
+
+def measure(build, blocks_data):
+    # timed separately, tracing slows every allocation down
+    gc.collect()
+    start = time.perf_counter()
+    container = build(blocks_data)
+    elapsed = time.perf_counter() - start
+    del container
+
+    gc.collect()
+    tracemalloc.start()
+    container = build(blocks_data)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del container
+    return size, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--blocks', type=int, default=50000)
+    args = parser.parse_args()
+
+    blocks_data = make_blocks_data(args.blocks)
+
+    builds = [
+        ('dict Block', lambda data: [DictBlock(**d) for d in data]),
+        ('slotted Block', lambda data: [Block.from_dict(d) for d in data]),
+        ('Notebook', Notebook.from_blocks_data),
+    ]
+
+    baseline = None
+    print(f"{'container':>14} {'bytes/block':>12} {'build (s)':>10} {'vs dict':>8}")
+    for name, build in builds:
+        size, elapsed = measure(build, blocks_data)
+        baseline = baseline or size
+        print(f"{name:>14} {size / args.blocks:>12.1f} {elapsed:>10.3f} "
+              f"{size / baseline:>8.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# time opening a textbook-like notebook of chapters and sections, with
+# its sections expanded and collapsed to chapter level
+#
+#   python benchmarks/bench_outline.py --chapters 30 --blocks-per-chapter 100
+#
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PyQt5.QtWidgets import QApplication
+import app
+
+
+def make_textbook(chapters, blocks_per_chapter):
+    # a chapter block, then sections with every third one a subsection
+    blocks = []
+    for chapter in range(chapters):
+        blocks.append({'title': f"chapter {chapter}",
+                       'notes': f"# Chapter {chapter}", 'cues': '',
+                       'hierarchy': 0, 'highlighted': 0})
+        for section in range(blocks_per_chapter - 1):
+            blocks.append({
+                'title': f"section {chapter}.{section}",
+                'notes': f"Some *notes* with `code` and $x^{section}$.",
+                'cues': f"- cue {section}",
+                'hierarchy': 2 if section % 3 == 2 else 1,
+                'highlighted': 0,
+            })
+    return blocks
+
+
+def open_notebook(qt_app, path, collapse_on_open, repeats):
+    app.MyApp.collapse_on_open = collapse_on_open
+    timings = []
+    for _ in range(repeats):
+        window = app.MyApp()
+        window.resize(900, 700)
+
+        start = time.perf_counter()
+        window.process_json_file(path)
+        qt_app.processEvents()
+        timings.append(time.perf_counter() - start)
+
+        widgets = len(window.notes_cues_list_widget.live_widgets)
+        window.close()
+        window.deleteLater()
+        qt_app.processEvents()
+    return sorted(timings)[len(timings) // 2], widgets
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--chapters', type=int, default=30)
+    parser.add_argument('--blocks-per-chapter', type=int, default=100)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    qt_app = QApplication(sys.argv)
+
+    print(f"{'notebook':>28} {'open (ms)':>10} {'widgets':>8}")
+    with tempfile.TemporaryDirectory() as folder:
+        cases = [
+            ("chapters only", make_textbook(args.chapters, 1), None),
+            ("textbook expanded",
+             make_textbook(args.chapters, args.blocks_per_chapter), None),
+            ("textbook collapsed",
+             make_textbook(args.chapters, args.blocks_per_chapter), 0),
+        ]
+        for name, blocks, collapse_on_open in cases:
+            path = os.path.join(folder, f"{name.replace(' ', '_')}.json")
+            with open(path, 'w') as file:
+                json.dump(blocks, file, indent=2)
+
+            elapsed, widgets = open_notebook(
+                qt_app, path, collapse_on_open, args.repeats)
+            label = f"{name} ({len(blocks)})"
+            print(f"{label:>28} {elapsed * 1e3:>10.1f} {widgets:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+# time rendering every cell of a notebook: parsing with mistune, reading
+# back from the on-disk render cache as a cold open does, and the
+# in-memory cache
+#
+#   python benchmarks/bench_render_cache.py --blocks 2000
+#
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import MarkdownRenderer
+
+
+def make_cells(size):
+    return [
+        f"# Notes {i}\n\nSome *notes* with `code`, a [link](http://x/{i}) "
+        f"and $x^{i}$.\n\n| a | b |\n|---|---|\n| {i} | {i + 1} |\n\n"
+        f"- [ ] task {i}\n- ~~done~~\n"
+        for i in range(size)
+    ]
+
+
+def render_all(cells):
+    start = time.perf_counter()
+    for cell in cells:
+        MarkdownRenderer.render_markdown(cell)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--blocks', type=int, default=2000)
+    args = parser.parse_args()
+
+    cells = make_cells(args.blocks)
+    MarkdownRenderer.render_cache.max_entries = args.blocks * 2
+
+    with tempfile.TemporaryDirectory() as directory:
+        parse = render_all(cells)
+
+        MarkdownRenderer.render_cache.clear()
+        MarkdownRenderer.open_disk_cache(directory)
+        populate = render_all(cells)
+
+        # a new session starts with an empty in-memory cache
+        MarkdownRenderer.render_cache.clear()
+        MarkdownRenderer.open_disk_cache(directory)
+        disk = render_all(cells)
+
+        memory = render_all(cells)
+        MarkdownRenderer.disk_cache.close()
+
+    print(f"{'':>16} {'total (ms)':>11} {'per cell (us)':>14}")
+    for name, elapsed in (('parse', parse), ('parse + store', populate),
+                          ('disk cache', disk), ('memory cache', memory)):
+        print(f"{name:>16} {elapsed * 1e3:>11.1f} "
+              f"{elapsed / args.blocks * 1e6:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
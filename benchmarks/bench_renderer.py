@@ -0,0 +1,119 @@
+# compare startup time and memory with and without the shared browser pool
+#
+#   python benchmarks/bench_renderer.py --blocks 200 --rendered 20
+#
+# each mode runs in its own process, since QtWebEngine keeps helper
+# processes alive; memory is the RSS of the app plus its helper processes
+# as reported by /proc, so the numbers are only available on Linux, and
+# rendering needs a working QtWebEngine
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from bench_load import make_notebook
+
+
+def children(pid):
+    pids = []
+    for task in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{task}/children") as file:
+            pids.extend(int(child) for child in file.read().split())
+    return pids
+
+
+def rss_kb(pid):
+    total = 0
+    with open(f"/proc/{pid}/status") as file:
+        for line in file:
+            if line.startswith('VmRSS:'):
+                total = int(line.split()[1])
+    for child in children(pid):
+        total += rss_kb(child)
+    return total
+
+
+def run_child(args):
+    from PyQt5.QtCore import Qt
+    from PyQt5.QtWidgets import QApplication
+    import app
+
+    app.MyApp.shared_renderer = args.mode == 'shared'
+
+    # QtWebEngine is imported on the first render, after the application
+    # exists, as in app.py
+    QApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
+    qt_app = QApplication(sys.argv)
+
+    start = time.perf_counter()
+    window = app.MyApp()
+    window.process_json_file(args.path)
+    qt_app.processEvents()
+    startup = time.perf_counter() - start
+
+    # render cells one after another, the way a reader scrolls through
+    view = window.notes_cues_list_widget
+    start = time.perf_counter()
+    for row in range(min(args.rendered, len(window.blocks))):
+        view.scrollTo(window.blocks_model.index(row, 0))
+        qt_app.processEvents()
+        widget = view.live_widgets.get(window.blocks[row])
+        if widget is not None and widget.notes_current_mode == "edit":
+            widget.notes_render_edit_button.click()
+            qt_app.processEvents()
+    render = time.perf_counter() - start
+
+    print(json.dumps({
+        'mode': args.mode,
+        'startup': startup,
+        'render': render,
+        'rss_mb': rss_kb(os.getpid()) / 1024,
+    }))
+
+    window.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--blocks', type=int, default=200)
+    parser.add_argument('--rendered', type=int, default=20)
+    parser.add_argument('--mode', choices=['shared', 'per-cell'])
+    parser.add_argument('--path')
+    args = parser.parse_args()
+
+    if args.mode is not None:
+        run_child(args)
+        return
+
+    print(f"{'mode':>10} {'startup (s)':>12} {'render (s)':>11} {'rss (MB)':>9}")
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'notebook.json')
+        with open(path, 'w') as file:
+            json.dump(make_notebook(args.blocks), file)
+
+        for mode in ('per-cell', 'shared'):
+            child = subprocess.run(
+                [sys.executable, os.path.abspath(__file__),
+                 '--mode', mode, '--path', path,
+                 '--blocks', str(args.blocks),
+                 '--rendered', str(args.rendered)],
+                capture_output=True, text=True)
+            if child.returncode != 0:
+                # usually QtWebEngine missing or failing to load
+                errors = child.stderr.strip().splitlines() or ['no output']
+                print(f"{mode:>10} failed: {errors[-1]}")
+                continue
+            result = json.loads(child.stdout.strip().splitlines()[-1])
+            print(f"{mode:>10} {result['startup']:>12.3f} "
+                  f"{result['render']:>11.3f} {result['rss_mb']:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
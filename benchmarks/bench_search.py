@@ -0,0 +1,109 @@
+# build and query the search index over a generated corpus of notebooks
+#
+#   python benchmarks/bench_search.py --blocks 50000 --notebooks 50
+#
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from Notebook import Block
+from SearchIndex import BlockIndex, FolderIndex
+
+QUERIES = ['the', 'entropy', 'entropy theorem', 'fourier transform proof',
+           'lagr', 'xq', 'eigen value decomposition']
+
+
+def make_vocabulary(size, rng):
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    words = ['the', 'of', 'and', 'entropy', 'theorem', 'fourier',
+             'transform', 'proof', 'lagrangian', 'eigen', 'value',
+             'decomposition']
+    while len(words) < size:
+        words.append(''.join(rng.choice(letters)
+                             for _ in range(rng.randint(3, 10))))
+    return words
+
+
+def make_corpus(blocks, notebooks, rng):
+    vocabulary = make_vocabulary(20000, rng)
+    # a few words are common, most are rare
+    cum_weights = list(itertools.accumulate(
+        1 / (rank + 1) for rank in range(len(vocabulary))))
+
+    def text(words):
+        return ' '.join(rng.choices(vocabulary, cum_weights=cum_weights,
+                                    k=words))
+
+    per_notebook = blocks // notebooks
+    return [[{'title': text(4), 'notes': text(80), 'cues': text(12),
+              'hierarchy': 0, 'highlighted': 0}
+             for _ in range(per_notebook)]
+            for _ in range(notebooks)]
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--blocks', type=int, default=50000)
+    parser.add_argument('--notebooks', type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    corpus = make_corpus(args.blocks, args.notebooks, rng)
+
+    # the open notebook, all blocks in one
+    live = BlockIndex()
+    live.reset([Block.from_dict(data)
+                for notebook in corpus for data in notebook])
+    elapsed, _ = timed(live.build)
+    print(f"open notebook, {len(live.blocks)} blocks: "
+          f"build {elapsed * 1e3:.0f} ms")
+
+    block = live.blocks[len(live.blocks) // 2]
+    block.notes = block.notes + ' entropy'
+    live.mark_changed(block)
+    elapsed, _ = timed(live.search, 'entropy', 20)
+    print(f"  reindex one edited block and search: {elapsed * 1e3:.2f} ms")
+
+    for query in QUERIES:
+        elapsed, hits = timed(live.search, query, 20)
+        print(f"  {query!r:>28}: {elapsed * 1e3:7.2f} ms")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for number, notebook in enumerate(corpus):
+            with open(os.path.join(directory, f"{number}.json"), 'w') as file:
+                json.dump(notebook, file)
+
+        folder = FolderIndex(directory)
+        elapsed, rebuilt = timed(folder.update)
+        print(f"folder of {len(corpus)} notebooks: build and save "
+              f"{elapsed * 1e3:.0f} ms ({rebuilt} rebuilt)")
+
+        folder = FolderIndex(directory)
+        elapsed, rebuilt = timed(folder.update)
+        print(f"  load saved indexes {elapsed * 1e3:.0f} ms "
+              f"({rebuilt} rebuilt)")
+
+        # the first query of a term decodes its postings
+        print(f"  {'':>28}  {'first':>8} {'again':>8}")
+        for query in QUERIES:
+            first, _ = timed(folder.search, query, 20)
+            again, _ = timed(folder.search, query, 20)
+            print(f"  {query!r:>28}: {first * 1e3:5.2f} ms {again * 1e3:5.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
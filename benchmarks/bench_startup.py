@@ -0,0 +1,67 @@
+# time from launching app.py to the first paint of its window, with the
+# -X importtime breakdown of the slowest top level imports
+#
+#   python benchmarks/bench_startup.py --runs 5
+#
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# none of these are needed before the first cell is rendered
+DEFERRED = ('PyQt5.QtWebEngineWidgets', 'mistune', 'pygments')
+
+
+def launch():
+    # returns the seconds to first paint and the import times by module
+    env = dict(os.environ, CORNELL_STARTUP_PROBE=repr(time.time()))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', 'app.py'], cwd=ROOT, env=env,
+        capture_output=True, text=True, timeout=120)
+
+    first_paint = None
+    for line in result.stdout.splitlines():
+        if line.startswith('first paint'):
+            first_paint = float(line.split()[2])
+    if first_paint is None:
+        raise SystemExit(f"app.py did not paint:\n{result.stderr[-2000:]}")
+
+    imports = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # top level imports are not indented beyond the separator space
+        if not name[1:].startswith(' '):
+            imports[name.strip()] = int(cumulative) / 1e6
+    return first_paint, imports
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    runs = [launch() for _ in range(args.runs)]
+    first_paints = [first_paint for first_paint, _ in runs]
+    imports = runs[-1][1]
+
+    print(f"first paint: median {statistics.median(first_paints) * 1e3:.0f} ms, "
+          f"min {min(first_paints) * 1e3:.0f} ms over {args.runs} runs")
+    print(f"top level imports, {sum(imports.values()) * 1e3:.0f} ms in total:")
+    for name, seconds in sorted(imports.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {seconds * 1e3:7.1f} ms  {name}")
+
+    loaded = [name for name in DEFERRED
+              if any(module == name or module.startswith(name + '.')
+                     for module in imports)]
+    print(f"loaded before first paint: {', '.join(loaded) or 'none of ' + ', '.join(DEFERRED)}")
+
+
+if __name__ == '__main__':
+    main()